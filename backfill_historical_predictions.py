@@ -5,10 +5,20 @@ nfl_historical_data.json (Jan 1 through today) so the Scores view can show
 "Predicted: X" and Correct/Wrong for all past dates.
 """
 
-import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+import numpy as np
+
+from json_io import dump_json_stream, load_json_cached
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; without it the kernel runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
 # NBA standard team abbreviations (exclude All-Star / special event teams)
 NBA_TEAMS = {
     'ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GS', 'GSW',
@@ -24,65 +34,115 @@ NFL_TEAMS = {
     'NYG', 'NYJ', 'PHI', 'PIT', 'SF', 'SEA', 'TB', 'TEN', 'WAS'
 }
 
+# Compact integer ids for the heuristic kernel; anything else maps to len(ids)
+NBA_TEAM_IDS = {t: i for i, t in enumerate(sorted(NBA_TEAMS))}
+NFL_TEAM_IDS = {t: i for i, t in enumerate(sorted(NFL_TEAMS))}
 
-def _nba_heuristic_predictions(games):
-    """Build predictions from historical results: use win rate and avg score before each game date."""
-    from collections import defaultdict
-    completed = [g for g in games if g.get('status') == 'completed' and g.get('winner')]
-    by_date = defaultdict(list)
-    for g in completed:
-        by_date[g['date']].append(g)
-    dates_sorted = sorted(by_date.keys())
-    predictions = []
-    for g in games:
-        home, away = g.get('home_team'), g.get('away_team')
-        if home not in NBA_TEAMS or away not in NBA_TEAMS:
+
+@njit(cache=True)
+def _heuristic_core(home_ids, away_ids, winner_ids, home_scores, away_scores, completed,
+                    date_ranks, n_slots, default_pts):
+    """Score date-sorted games from running per-team totals; returns (winner_is_home, confidence)."""
+    n = home_ids.shape[0]
+    wins = np.zeros(n_slots)
+    games_played = np.zeros(n_slots)
+    pts_sum = np.zeros(n_slots)
+    winner_is_home = np.zeros(n, dtype=np.bool_)
+    confs = np.zeros(n)
+    start = 0
+    while start < n:
+        end = start
+        while end < n and date_ranks[end] == date_ranks[start]:
+            end += 1
+        # Predict the whole date before folding in any of its results
+        for k in range(start, end):
+            h, a = home_ids[k], away_ids[k]
+            wr_h = wins[h] / games_played[h] if games_played[h] > 0 else 0.5
+            wr_a = wins[a] / games_played[a] if games_played[a] > 0 else 0.5
+            if wr_h != wr_a:
+                winner_is_home[k] = wr_h > wr_a
+                conf = 0.5 + abs(wr_h - wr_a)
+            else:
+                avg_h = pts_sum[h] / games_played[h] if games_played[h] > 0 else default_pts
+                avg_a = pts_sum[a] / games_played[a] if games_played[a] > 0 else default_pts
+                winner_is_home[k] = avg_h >= avg_a
+                conf = 0.55
+            confs[k] = min(0.92, max(0.52, conf))
+        for k in range(start, end):
+            if completed[k]:
+                h, a = home_ids[k], away_ids[k]
+                games_played[h] += 1
+                games_played[a] += 1
+                pts_sum[h] += home_scores[k]
+                pts_sum[a] += away_scores[k]
+                wins[winner_ids[k]] += 1
+        start = end
+    return winner_is_home, confs
+
+
+def _heuristic_picks(games, team_ids, default_pts):
+    """Yield (game, date, winner, confidence) using win rate and avg score before each game date.
+
+    Each game is encoded once as integer team ids, scores and a date rank; games with no
+    league team (All-Star squads etc.) can't move any league team's totals and are dropped.
+    Teams outside the league share the last id slot. _heuristic_core then predicts every
+    game on a date from the running totals before folding in that date's completed
+    results, so no game sees its own (or a same-day) result.
+    """
+    other_id = len(team_ids)
+    rows = []
+    for i, g in enumerate(games):
+        home = team_ids.get(g.get('home_team'), other_id)
+        away = team_ids.get(g.get('away_team'), other_id)
+        if home == other_id and away == other_id:
             continue
-        game_date = g.get('date') or ''
-        team_wins = defaultdict(int)
-        team_games = defaultdict(int)
-        team_pts = defaultdict(list)
-        for d in dates_sorted:
-            if d >= game_date:
-                break
-            for gm in by_date[d]:
-                for t in (gm['home_team'], gm['away_team']):
-                    team_games[t] += 1
-                    team_pts[t].append(gm['home_score'] if t == gm['home_team'] else gm['away_score'])
-                team_wins[gm['winner']] += 1
-        wr_h = team_wins[home] / team_games[home] if team_games[home] else 0.5
-        wr_a = team_wins[away] / team_games[away] if team_games[away] else 0.5
-        avg_h = sum(team_pts[home]) / len(team_pts[home]) if team_pts[home] else 100
-        avg_a = sum(team_pts[away]) / len(team_pts[away]) if team_pts[away] else 100
-        if wr_h != wr_a:
-            winner = home if wr_h > wr_a else away
-            conf = 0.5 + abs(wr_h - wr_a)
-        else:
-            winner = home if avg_h >= avg_a else away
-            conf = 0.55
-        conf = min(0.92, max(0.52, conf))
-        predictions.append({
-            'home_team': home,
-            'away_team': away,
-            'date': game_date,
-            'winner': winner,
-            'confidence': conf,
-            'home_win_prob': conf if winner == home else 1 - conf,
-            'away_win_prob': 1 - conf if winner == home else conf,
-        })
-    return predictions
+        done = g.get('status') == 'completed' and bool(g.get('winner'))
+        rows.append((g.get('date') or '', i, home, away, team_ids.get(g.get('winner'), other_id),
+                     done, g['home_score'] if done else 0, g['away_score'] if done else 0))
+    if not rows:
+        return
+    rows.sort(key=lambda row: row[0])
+
+    dates, order = [row[0] for row in rows], [row[1] for row in rows]
+    _, date_ranks = np.unique(dates, return_inverse=True)
+    cols = np.array([row[2:] for row in rows], dtype=np.int32)
+    home_ids, away_ids = cols[:, 0], cols[:, 1]
+
+    winner_is_home, confs = _heuristic_core(home_ids, away_ids, cols[:, 2], cols[:, 4], cols[:, 5],
+                                            cols[:, 3].astype(np.bool_), date_ranks.astype(np.int32),
+                                            other_id + 1, float(default_pts))
+
+    eligible = (home_ids < other_id) & (away_ids < other_id)
+    picks = [None] * len(games)
+    for pos in np.flatnonzero(eligible).tolist():
+        g = games[order[pos]]
+        winner = g['home_team'] if winner_is_home[pos] else g['away_team']
+        picks[order[pos]] = (g, dates[pos], winner, float(confs[pos]))
+
+    yield from (pick for pick in picks if pick is not None)
+
+
+def _nba_heuristic_predictions(games):
+    """Yield predictions from historical results: use win rate and avg score before each game date."""
+    return ({
+        'home_team': g['home_team'],
+        'away_team': g['away_team'],
+        'date': game_date,
+        'winner': winner,
+        'confidence': conf,
+        'home_win_prob': conf if winner == g['home_team'] else 1 - conf,
+        'away_win_prob': 1 - conf if winner == g['home_team'] else conf,
+    } for g, game_date, winner, conf in _heuristic_picks(games, NBA_TEAM_IDS, 100))
 
 
 def backfill_nba():
-    """Generate predictions for all games in nba_historical_data.json."""
+    """Generate predictions for all games in nba_historical_data.json; returns the number written."""
     if not os.path.exists('nba_historical_data.json'):
         print("nba_historical_data.json not found. Run fetch_historical_data.py first.")
-        return []
+        return 0
 
-    with open('nba_historical_data.json', 'r') as f:
-        games = json.load(f)
+    games = load_json_cached('nba_historical_data.json')
 
-    predictions = []
     skipped = 0
     use_heuristic = False
     try:
@@ -96,99 +156,57 @@ def backfill_nba():
     if use_heuristic:
         predictions = _nba_heuristic_predictions(games)
     else:
-        for g in games:
-            home, away = g.get('home_team'), g.get('away_team')
-            if home not in NBA_TEAMS or away not in NBA_TEAMS:
-                skipped += 1
-                continue
-            try:
-                pred = predictor.predict_game(home, away, None)
-                predictions.append({
-                    'home_team': home,
-                    'away_team': away,
-                    'date': g.get('date'),
-                    'winner': pred['winner'],
-                    'confidence': pred['confidence'],
-                    'home_win_prob': pred['home_win_prob'],
-                    'away_win_prob': pred['away_win_prob'],
-                })
-            except Exception as e:
-                skipped += 1
-                continue
+        # Score every league game the model knows in one batch
+        known = [t for t in NBA_TEAMS if t in predictor.team_stats.index]
+        homes = np.asarray([g.get('home_team') or '' for g in games], dtype=str)
+        aways = np.asarray([g.get('away_team') or '' for g in games], dtype=str)
+        eligible = np.flatnonzero(np.isin(homes, known) & np.isin(aways, known))
+        skipped = len(games) - len(eligible)
+        pairs = list(zip(homes[eligible].tolist(), aways[eligible].tolist()))
+        predictions = ({
+            'home_team': home,
+            'away_team': away,
+            'date': games[i].get('date'),
+            'winner': pred['winner'],
+            'confidence': pred['confidence'],
+            'home_win_prob': pred['home_win_prob'],
+            'away_win_prob': pred['away_win_prob'],
+        } for i, (home, away), pred in zip(eligible.tolist(), pairs, predictor.predict_games(pairs)))
 
     out_path = 'nba_historical_predictions.json'
-    with open(out_path, 'w') as f:
-        json.dump(predictions, f, indent=2)
-    print(f"NBA: Wrote {len(predictions)} predictions to {out_path} (skipped {skipped})")
-    return predictions
+    written = dump_json_stream(predictions, out_path)
+    print(f"NBA: Wrote {written} predictions to {out_path} (skipped {skipped})")
+    return written
 
 
 def _nfl_heuristic_predictions(games):
-    """Build predictions from historical results (date-aware)."""
-    from collections import defaultdict
-    completed = [g for g in games if g.get('status') == 'completed' and g.get('winner')]
-    by_date = defaultdict(list)
-    for g in completed:
-        by_date[g['date']].append(g)
-    dates_sorted = sorted(by_date.keys())
-    predictions = []
-    for g in games:
-        home, away = g.get('home_team'), g.get('away_team')
-        if home not in NFL_TEAMS or away not in NFL_TEAMS:
-            continue
-        game_date = g.get('date') or ''
-        team_wins = defaultdict(int)
-        team_games = defaultdict(int)
-        team_pts = defaultdict(list)
-        for d in dates_sorted:
-            if d >= game_date:
-                break
-            for gm in by_date[d]:
-                for t in (gm['home_team'], gm['away_team']):
-                    team_games[t] += 1
-                    team_pts[t].append(gm['home_score'] if t == gm['home_team'] else gm['away_score'])
-                team_wins[gm['winner']] += 1
-        wr_h = team_wins[home] / team_games[home] if team_games[home] else 0.5
-        wr_a = team_wins[away] / team_games[away] if team_games[away] else 0.5
-        avg_h = sum(team_pts[home]) / len(team_pts[home]) if team_pts[home] else 22
-        avg_a = sum(team_pts[away]) / len(team_pts[away]) if team_pts[away] else 22
-        if wr_h != wr_a:
-            winner = home if wr_h > wr_a else away
-            conf = 0.5 + abs(wr_h - wr_a)
-        else:
-            winner = home if avg_h >= avg_a else away
-            conf = 0.55
-        conf = min(0.92, max(0.52, conf))
-        predictions.append({
-            'home_team': home,
-            'away_team': away,
-            'date': game_date,
-            'week': g.get('week'),
-            'winner': winner,
-            'confidence': conf,
-            'home_win_prob': conf if winner == home else 1 - conf,
-            'away_win_prob': 1 - conf if winner == home else conf,
-        })
-    return predictions
+    """Yield predictions from historical results (date-aware)."""
+    return ({
+        'home_team': g['home_team'],
+        'away_team': g['away_team'],
+        'date': game_date,
+        'week': g.get('week'),
+        'winner': winner,
+        'confidence': conf,
+        'home_win_prob': conf if winner == g['home_team'] else 1 - conf,
+        'away_win_prob': 1 - conf if winner == g['home_team'] else conf,
+    } for g, game_date, winner, conf in _heuristic_picks(games, NFL_TEAM_IDS, 22))
 
 
 def backfill_nfl():
-    """Generate predictions for all games in nfl_historical_data.json."""
+    """Generate predictions for all games in nfl_historical_data.json; returns the number written."""
     if not os.path.exists('nfl_historical_data.json'):
         print("nfl_historical_data.json not found. Run fetch_historical_data.py first.")
-        return []
+        return 0
 
-    with open('nfl_historical_data.json', 'r') as f:
-        games = json.load(f)
+    games = load_json_cached('nfl_historical_data.json')
 
     completed = [g for g in games if g.get('status') == 'completed' and g.get('home_score') is not None]
     if not completed:
         print("No completed NFL games in historical data.")
-        return []
+        return 0
 
-    predictions = []
     skipped = 0
-    use_heuristic = False
     try:
         import pandas as pd
         from nfl_ml_model import NFLGamePredictor
@@ -196,47 +214,52 @@ def backfill_nfl():
                     'away_score': g['away_score'], 'winner': g.get('winner'), 'week': g.get('week'), 'date': g.get('date')}
                    for g in completed]
         df_all = pd.DataFrame(df_rows).sort_values('date').reset_index(drop=True)
+        # df_all is date-sorted, so each game's history is a prefix found by binary search
+        date_arr = df_all['date'].to_numpy(dtype=str)
         predictor = NFLGamePredictor()
         predictor.load_model('nfl_model.pkl')
+    except Exception as e:
+        print(f"NFL model not available ({e}). Using heuristic from historical data.")
+        predictor = None
+
+    def model_predictions():
+        nonlocal skipped
         for g in games:
             home, away = g.get('home_team'), g.get('away_team')
             if home not in NFL_TEAMS or away not in NFL_TEAMS:
                 skipped += 1
                 continue
             game_date = g.get('date')
-            df_before = df_all[df_all['date'] < game_date] if game_date else df_all
-            if len(df_before) == 0:
-                df_before = df_all
+            cutoff = np.searchsorted(date_arr, game_date, side='left') if game_date else len(df_all)
+            df_before = df_all.iloc[:cutoff] if cutoff else df_all
             try:
                 pred = predictor.predict(home, away, df_before, None)
                 if pred:
-                    predictions.append({
+                    yield {
                         'home_team': home, 'away_team': away, 'date': game_date, 'week': g.get('week'),
                         'winner': pred['winner'], 'confidence': pred['confidence'],
                         'home_win_prob': pred['home_win_prob'], 'away_win_prob': pred['away_win_prob'],
-                    })
+                    }
                 else:
                     skipped += 1
             except Exception:
                 skipped += 1
-    except Exception as e:
-        print(f"NFL model not available ({e}). Using heuristic from historical data.")
-        use_heuristic = True
 
-    if use_heuristic:
-        predictions = _nfl_heuristic_predictions(games)
+    predictions = model_predictions() if predictor else _nfl_heuristic_predictions(games)
 
     out_path = 'nfl_historical_predictions.json'
-    with open(out_path, 'w') as f:
-        json.dump(predictions, f, indent=2)
-    print(f"NFL: Wrote {len(predictions)} predictions to {out_path} (skipped {skipped})")
-    return predictions
+    written = dump_json_stream(predictions, out_path)
+    print(f"NFL: Wrote {written} predictions to {out_path} (skipped {skipped})")
+    return written
 
 
 def main():
     print("Backfilling historical predictions (Jan 1 – today)...")
-    backfill_nba()
-    backfill_nfl()
+    # The two sports share no state and write separate files, so run them side by side
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(backfill_nba), executor.submit(backfill_nfl)]
+        for future in futures:
+            future.result()
     print("Done.")
 
 
@@ -3,22 +3,47 @@ Daily Prediction Script
 Runs daily to generate predictions and update accuracy tracking
 """
 
-import json
 import os
+import pickle
 from datetime import datetime, timedelta
 from ml_model import NBAGamePredictor
 import pandas as pd
-import requests
+import numpy as np
+from urllib3.util.retry import Retry
+from http_cache import make_cached_session
 from nba_data_fetcher import NBADataFetcher
+from json_io import load_json, load_json_cached, dump_json
 
 STATS_FILE = 'prediction_stats.json'
 PREDICTIONS_FILE = 'daily_predictions.json'
+MODEL_PATH = 'nba_model.pkl'
+
+# Trained predictor, kept for the life of the process (see get_predictor)
+_predictor = None
+
+# Schedule API session, created on first use (see get_http_session)
+_http = None
+
+def get_http_session():
+    """Return the process-wide schedule API session, opening it on first use
+    
+    Keep-alive, so repeat calls skip the TCP/TLS handshake; responses are cached on
+    disk for 5 minutes so cron retries don't refetch the slate.
+    """
+    global _http
+    if _http is None:
+        _http = make_cached_session(pool_size=4, max_retries=Retry(total=2, backoff_factor=0.2),
+                                    expire_after=300)
+    return _http
+
+def pair_key(team_a, team_b):
+    """Order-independent key for a matchup, e.g. 'BOS|LAL' for BOS vs LAL or LAL vs BOS"""
+    return f"{team_a}|{team_b}" if team_a <= team_b else f"{team_b}|{team_a}"
 
 def load_stats():
     """Load current statistics"""
     if os.path.exists(STATS_FILE):
-        with open(STATS_FILE, 'r') as f:
-            return json.load(f)
+        return load_json(STATS_FILE)
     return {
         'total_predictions': 0,
         'correct_predictions': 0,
@@ -27,17 +52,16 @@ def load_stats():
 
 def save_stats(stats):
     """Save statistics to file"""
-    with open(STATS_FILE, 'w') as f:
-        json.dump(stats, f, indent=2)
+    dump_json(stats, STATS_FILE)
 
-def get_todays_games_from_api():
-    """Get today's games from NBA API"""
-    today = datetime.now().date()
+def get_todays_games_from_api(run_date=None):
+    """Get today's games from NBA API (run_date defaults to today)"""
+    today = run_date or datetime.now().date()
     
     # Try to get games from balldontlie API (free, no key needed)
     try:
         url = f"https://www.balldontlie.io/api/v1/games?dates[]={today}"
-        response = requests.get(url, timeout=10)
+        response = get_http_session().get(url, timeout=10)
         if response.status_code == 200:
             data = response.json()
             games = []
@@ -82,127 +106,137 @@ def get_todays_games_from_api():
             })
     
     if games:
-        print(f"Generated {len(games)} fallback games for {today_str}")
+        print(f"Generated {len(games)} fallback games for {today.isoformat()}")
         return games
     
     return []
 
-def get_todays_games(df):
+def build_date_index(df):
+    """Map each calendar day in df to the positions of its rows (for games_on)"""
+    return df.groupby(df['Data'].dt.floor('D')).indices
+
+def games_on(df, date_index, day):
+    """Rows of df played on day, looked up in a build_date_index() mapping"""
+    return df.iloc[date_index.get(pd.Timestamp(day), [])]
+
+def get_todays_games(df, date_index=None, run_date=None):
     """Get games scheduled for today - tries API first, then dataset"""
-    today = datetime.now().date()
+    today = run_date or datetime.now().date()
     
     # First try API for live games
-    api_games = get_todays_games_from_api()
+    api_games = get_todays_games_from_api(today)
     if api_games:
         print(f"Found {len(api_games)} games from API")
         return api_games
     
     # Fallback to dataset
-    today_games = df[df['Data'].dt.date == today]
-    
-    # Get unique matchups
-    matchups = []
-    seen = set()
-    
-    for _, row in today_games.iterrows():
-        matchup_key = tuple(sorted([row['Tm'], row['Opp']]))
-        if matchup_key not in seen:
-            seen.add(matchup_key)
-            matchups.append({
-                'home_team': row['Tm'],
-                'away_team': row['Opp'],
-                'date': today.isoformat()
-            })
+    if date_index is None:
+        date_index = build_date_index(df)
+    today_games = games_on(df, date_index, today)
+    
+    # Get unique matchups (first row of each unordered pair keeps its home/away orientation)
+    pairs = np.sort(today_games[['Tm', 'Opp']].to_numpy(), axis=1)
+    first_seen = ~pd.DataFrame(pairs, columns=['a', 'b']).duplicated().to_numpy()
     
-    return matchups
+    return [{
+        'home_team': home,
+        'away_team': away,
+        'date': today.isoformat()
+    } for home, away in zip(today_games['Tm'].to_numpy()[first_seen], today_games['Opp'].to_numpy()[first_seen])]
 
-def update_accuracy(df, predictor):
+def update_accuracy(df, predictor, date_index=None, run_date=None):
     """Update accuracy based on completed games - checks both dataset and API"""
     stats = load_stats()
     data_fetcher = NBADataFetcher()
     
     # Get all games from yesterday and earlier that haven't been checked yet
-    today = datetime.now().date()
-    yesterday = (today - pd.Timedelta(days=1))
+    today = run_date or datetime.now().date()
+    yesterday = today - timedelta(days=1)
     
-    # Check all games from the past week that we predicted
-    dates_to_check = [yesterday - pd.Timedelta(days=i) for i in range(7)]
+    # Check all games from the past week that we predicted, after the last fully resolved date
+    last_checked = stats.get('last_checked', '')
+    dates_to_check = [yesterday - timedelta(days=i) for i in range(7)]
+    dates_to_check = [d for d in dates_to_check if d.isoformat() > last_checked]
+    
+    # Dataset rows grouped by day once, so each date below is a dict lookup rather than a scan
+    if date_index is None:
+        date_index = build_date_index(df)
     
     # Load previous predictions
     if os.path.exists(PREDICTIONS_FILE):
-        with open(PREDICTIONS_FILE, 'r') as f:
-            all_predictions = json.load(f)
+        all_predictions = load_json(PREDICTIONS_FILE)
     else:
         all_predictions = []
     
-    # Track which dates we've already processed
+    # Track which dates and games we've already processed
     processed_dates = set()
+    recorded_games = set()
     if 'predictions_history' in stats:
         processed_dates = {entry.get('date') for entry in stats['predictions_history']}
+        recorded_games = {(entry.get('date'), entry.get('home_team'), entry.get('away_team'))
+                          for entry in stats['predictions_history']}
+    
+    # Dates with nothing left to resolve (see the watermark update below)
+    done_dates = set()
+    
+    # Index completed historical-file results once: date -> {pair_key: winner}
+    historical_winners = {}
+    if os.path.exists('nba_historical_data.json'):
+        try:
+            for g in load_json_cached('nba_historical_data.json'):
+                if g.get('status') == 'completed':
+                    key = pair_key(g['home_team'], g['away_team'])
+                    historical_winners.setdefault(g.get('date'), {}).setdefault(key, g.get('winner'))
+        except Exception as e:
+            print(f"Error loading historical data: {e}")
     
     # Check each date
     for check_date in dates_to_check:
-        date_str = check_date.isoformat() if isinstance(check_date, datetime) else str(check_date)
+        date_str = check_date.isoformat()
         if date_str in processed_dates:
+            done_dates.add(date_str)
             continue
         
-        # First try to get results from historical data file (most up-to-date)
-        historical_results = []
-        if os.path.exists('nba_historical_data.json'):
-            try:
-                with open('nba_historical_data.json', 'r') as f:
-                    historical_data = json.load(f)
-                    historical_results = [g for g in historical_data if g.get('date') == date_str and g.get('status') == 'completed']
-            except Exception as e:
-                print(f"Error loading historical data: {e}")
-        
-        # Then try API (for recent games)
-        api_results = data_fetcher.get_game_results(date_str)
-        
-        # Also check dataset
-        check_date_obj = check_date.date() if isinstance(check_date, datetime) else check_date
-        date_games = df[df['Data'].dt.date == check_date_obj]
-        
         # Find predictions for this date
         date_predictions = [p for p in all_predictions if p.get('date') == date_str]
         
         if len(date_predictions) == 0:
+            done_dates.add(date_str)
             continue
         
+        # Results from the historical data file (most up-to-date)
+        historical_results = historical_winners.get(date_str, {})
+        
+        # Then try API (for recent games)
+        api_results = data_fetcher.get_game_results(date_str)
+        api_winners = {}
+        for result in api_results or []:
+            api_winners.setdefault(pair_key(result['home_team'], result['away_team']), result['winner'])
+        
+        # Also check dataset: one entry per unordered pair, first row wins
+        date_games = games_on(df, date_index, check_date)
+        dataset_winners = {}
+        for tm, opp, res in zip(date_games['Tm'].to_numpy(), date_games['Opp'].to_numpy(), date_games['Res'].to_numpy()):
+            dataset_winners.setdefault(pair_key(tm, opp), tm if res == 'W' else opp)
+        
         # Check each prediction for this date
+        unresolved = 0
         for pred in date_predictions:
-            actual_winner = None
+            game_key = (date_str, pred['home_team'], pred['away_team'])
+            if game_key in recorded_games:
+                continue
+            pair = pred.get('pair_key') or pair_key(pred['home_team'], pred['away_team'])
             
-            # Try historical data first (most up-to-date)
-            if historical_results:
-                for result in historical_results:
-                    if ((result['home_team'] == pred['home_team'] and result['away_team'] == pred['away_team']) or
-                        (result['home_team'] == pred['away_team'] and result['away_team'] == pred['home_team'])):
-                        actual_winner = result.get('winner')
-                        break
-            
-            # Then try API results
-            if actual_winner is None and api_results:
-                for result in api_results:
-                    if ((result['home_team'] == pred['home_team'] and result['away_team'] == pred['away_team']) or
-                        (result['home_team'] == pred['away_team'] and result['away_team'] == pred['home_team'])):
-                        actual_winner = result['winner']
-                        break
-            
-            # Fallback to dataset if API didn't have it
-            if actual_winner is None and len(date_games) > 0:
-                game = date_games[
-                    ((date_games['Tm'] == pred['home_team']) & 
-                     (date_games['Opp'] == pred['away_team'])) |
-                    ((date_games['Tm'] == pred['away_team']) & 
-                     (date_games['Opp'] == pred['home_team']))
-                ]
-                
-                if len(game) > 0:
-                    actual_winner = game.iloc[0]['Tm'] if game.iloc[0]['Res'] == 'W' else game.iloc[0]['Opp']
+            # Try historical data first, then API results, then the dataset
+            actual_winner = historical_results.get(pair)
+            if actual_winner is None:
+                actual_winner = api_winners.get(pair)
+            if actual_winner is None:
+                actual_winner = dataset_winners.get(pair)
             
             # Update stats if we found the result
             if actual_winner:
+                recorded_games.add(game_key)
                 predicted_winner = pred['winner']
                 
                 stats['total_predictions'] += 1
@@ -211,41 +245,77 @@ def update_accuracy(df, predictor):
                 
                 stats['predictions_history'].append({
                     'date': date_str,
+                    'home_team': pred['home_team'],
+                    'away_team': pred['away_team'],
                     'predicted': predicted_winner,
                     'actual': actual_winner,
                     'correct': actual_winner == predicted_winner,
                     'confidence': pred['confidence']
                 })
                 print(f"Updated: {pred['home_team']} vs {pred['away_team']} - Predicted: {predicted_winner}, Actual: {actual_winner}, Correct: {actual_winner == predicted_winner}")
+            else:
+                unresolved += 1
+        
+        if unresolved == 0:
+            done_dates.add(date_str)
+    
+    # Advance the watermark over the oldest unbroken run of finished dates so later runs skip them
+    for check_date in sorted(dates_to_check):
+        if check_date.isoformat() not in done_dates:
+            break
+        stats['last_checked'] = check_date.isoformat()
     
     save_stats(stats)
     return stats
 
-def generate_todays_predictions():
-    """Generate predictions for today's games with injury data"""
+def get_predictor():
+    """Return the process-wide predictor, loading (or training) the model on first use"""
+    global _predictor
+    if _predictor is None:
+        predictor = NBAGamePredictor()
+        
+        # Load the saved model if there is one; train when it is missing or unreadable
+        loaded = False
+        if os.path.exists(MODEL_PATH) and os.path.getsize(MODEL_PATH) > 0:
+            try:
+                predictor.load_model(MODEL_PATH)
+                print("Model loaded successfully")
+                loaded = True
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, KeyError) as e:
+                # Truncated/corrupt file, pickled by an incompatible scikit-learn (ValueError),
+                # or saved before the current team_stats layout (KeyError)
+                print(f"Could not load {MODEL_PATH}: {e}")
+                predictor = NBAGamePredictor()  # drop anything the failed load already set
+        
+        if not loaded:
+            print("Training new model...")
+            df = predictor.load_data()
+            predictor.train(df)
+            predictor.save_model(MODEL_PATH)
+            print("Model trained and saved")
+        _predictor = predictor
+    return _predictor
+
+def generate_todays_predictions(run_date=None):
+    """Generate predictions for today's games with injury data
+    
+    run_date (default: today) is captured once and used for every "today" in the run,
+    so a run that straddles midnight doesn't mix two days.
+    """
+    today = run_date or datetime.now().date()
     print("Loading model and data...")
-    predictor = NBAGamePredictor()
+    predictor = get_predictor()
     data_fetcher = NBADataFetcher()
     
-    # Try to load model, otherwise train
-    try:
-        predictor.load_model('nba_model.pkl')
-        print("Model loaded successfully")
-    except:
-        print("Training new model...")
-        df = predictor.load_data()
-        predictor.train(df)
-        predictor.save_model('nba_model.pkl')
-        print("Model trained and saved")
-    
     # Load data for today's games and historical data
     df = predictor.load_data()
     print(f"Loaded {len(df)} game records from 2024-25 season")
+    date_index = build_date_index(df)
     
     # Update accuracy from completed games (yesterday and earlier)
     print("Updating accuracy from completed games...")
     try:
-        update_accuracy(df, predictor)
+        update_accuracy(df, predictor, date_index, today)
     except Exception as e:
         print(f"Error updating accuracy: {e}")
         import traceback
@@ -253,7 +323,7 @@ def generate_todays_predictions():
     
     # Get today's games
     print("Getting today's games...")
-    today_games = get_todays_games(df)
+    today_games = get_todays_games(df, date_index, today)
     
     if len(today_games) == 0:
         print("No games scheduled for today")
@@ -262,8 +332,10 @@ def generate_todays_predictions():
     print(f"Found {len(today_games)} games today")
     print("Fetching injury and roster data...")
     
-    # Generate predictions with injury data
-    predictions = []
+    # Generate predictions with injury data: injury factors for every game first, then one
+    # batched model call for the whole slate (every team's strength is computed in one pass,
+    # on the first lookup)
+    batch = []
     for game in today_games:
         try:
             # Get injury/roster data for this game
@@ -283,61 +355,81 @@ def generate_todays_predictions():
                 print(f"  {game['home_team']}: {injury_data['home_active_players']} active players (factor: {injury_data['home_injury_factor']:.2f})")
                 print(f"  {game['away_team']}: {injury_data['away_active_players']} active players (factor: {injury_data['away_injury_factor']:.2f})")
             
-            # Make prediction with injury adjustments
-            pred = predictor.predict_game(
-                game['home_team'], 
-                game['away_team'],
-                injury_factors if injury_factors else None
-            )
-            
-            predictions.append({
-                'home_team': game['home_team'],
-                'away_team': game['away_team'],
-                'winner': pred['winner'],
-                'confidence': pred['confidence'],
-                'home_win_prob': pred['home_win_prob'],
-                'away_win_prob': pred['away_win_prob'],
-                'home_injury_factor': pred.get('home_injury_factor', 1.0),
-                'away_injury_factor': pred.get('away_injury_factor', 1.0),
-                'date': game['date']
-            })
-            
-            injury_note = ""
-            if pred.get('home_injury_factor', 1.0) < 0.9 or pred.get('away_injury_factor', 1.0) < 0.9:
-                injury_note = " (injuries considered)"
-            
-            print(f"Predicted: {game['home_team']} vs {game['away_team']} -> {pred['winner']} ({(pred['confidence']*100):.1f}%){injury_note}")
+            batch.append((game, injury_factors if injury_factors else None))
         except Exception as e:
             print(f"Error predicting {game['home_team']} vs {game['away_team']}: {e}")
             import traceback
             traceback.print_exc()
     
+    # Make predictions with injury adjustments
+    try:
+        batch_preds = predictor.predict_games(
+            [(game['home_team'], game['away_team']) for game, _ in batch],
+            [injury_factors for _, injury_factors in batch]
+        )
+    except ValueError:
+        # An unknown team fails the whole batch; predict one game at a time so only it is skipped
+        batch_preds = None
+    
+    if batch_preds is None:
+        batch_preds = []
+        for game, injury_factors in batch:
+            try:
+                batch_preds.append(predictor.predict_game(game['home_team'], game['away_team'], injury_factors))
+            except Exception as e:
+                print(f"Error predicting {game['home_team']} vs {game['away_team']}: {e}")
+                import traceback
+                traceback.print_exc()
+                batch_preds.append(None)
+    
+    predictions = []
+    for (game, _), pred in zip(batch, batch_preds):
+        if pred is None:
+            continue
+        
+        predictions.append({
+            'home_team': game['home_team'],
+            'away_team': game['away_team'],
+            'winner': pred['winner'],
+            'confidence': pred['confidence'],
+            'home_win_prob': pred['home_win_prob'],
+            'away_win_prob': pred['away_win_prob'],
+            'home_injury_factor': pred.get('home_injury_factor', 1.0),
+            'away_injury_factor': pred.get('away_injury_factor', 1.0),
+            'date': game['date'],
+            'pair_key': pair_key(game['home_team'], game['away_team'])
+        })
+        
+        injury_note = ""
+        if pred.get('home_injury_factor', 1.0) < 0.9 or pred.get('away_injury_factor', 1.0) < 0.9:
+            injury_note = " (injuries considered)"
+        
+        print(f"Predicted: {game['home_team']} vs {game['away_team']} -> {pred['winner']} ({(pred['confidence']*100):.1f}%){injury_note}")
+    
     # Load existing predictions and merge (keep only today and yesterday)
     existing_predictions = []
     if os.path.exists(PREDICTIONS_FILE):
-        with open(PREDICTIONS_FILE, 'r') as f:
-            existing_predictions = json.load(f)
+        existing_predictions = load_json(PREDICTIONS_FILE)
     
-    # Only keep today and yesterday
-    today_str = datetime.now().date().isoformat()
-    yesterday_str = (datetime.now().date() - timedelta(days=1)).isoformat()
-    existing_predictions = [p for p in existing_predictions 
-                          if p.get('date') in [today_str, yesterday_str]]
+    today_str = today.isoformat()
+    yesterday_str = (today - timedelta(days=1)).isoformat()
     
-    # Remove old predictions for today's date (if regenerating)
-    existing_predictions = [p for p in existing_predictions if p.get('date') != today_str]
-    
-    # Add today's predictions
-    existing_predictions.extend(predictions)
+    # One entry per (date, home, away): keep yesterday's, and replace today's with this run's
+    # (the file stays a flat list for the website)
+    store = {}
+    for p in existing_predictions:
+        if p.get('date') == yesterday_str:
+            store[(p['date'], p.get('home_team'), p.get('away_team'))] = p
+    for p in predictions:
+        store[(p['date'], p['home_team'], p['away_team'])] = p
     
     # Save all predictions (sorted by date, most recent first)
-    existing_predictions.sort(key=lambda x: x.get('date', ''), reverse=True)
-    with open(PREDICTIONS_FILE, 'w') as f:
-        json.dump(existing_predictions, f, indent=2)
+    existing_predictions = sorted(store.values(), key=lambda x: x.get('date', ''), reverse=True)
+    dump_json(existing_predictions, PREDICTIONS_FILE)
     
-    # Ensure stats file exists (save current stats)
-    stats = load_stats()
-    save_stats(stats)
+    # Ensure stats file exists (update_accuracy already saved it unless it failed early)
+    if not os.path.exists(STATS_FILE):
+        save_stats(load_stats())
     
     print(f"\nGenerated {len(predictions)} predictions for today")
     return predictions
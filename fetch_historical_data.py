@@ -3,157 +3,152 @@ Historical Data Fetcher
 Fetches all NBA and NFL game data from Super Bowl (Feb 9, 2025) to All-Star period (Feb 16-18, 2025)
 """
 
-import requests
 import pandas as pd
 from datetime import datetime, timedelta
-import time
-import json
-from nba_data_fetcher import NBADataFetcher
-from nfl_data_fetcher import NFLDataFetcher
+from concurrent.futures import ThreadPoolExecutor
+from requests_cache import NEVER_EXPIRE
+from http_cache import make_cached_session
+from json_io import parse_json, dump_json
 
-def fetch_nba_historical_data(start_date, end_date):
-    """Fetch all NBA games from start_date to end_date"""
-    print(f"\n=== Fetching NBA data from {start_date} to {end_date} ===")
-    data_fetcher = NBADataFetcher()
-    all_games = []
+# ESPN scoreboard for one sport ('basketball/nba', 'football/nfl') on one YYYYMMDD date
+ESPN_SCOREBOARD_URL = "https://site.api.espn.com/apis/site/v2/sports/{sport}/scoreboard?dates={date}"
+
+# (month, day) windows, inclusive, when a sport's scoreboard is empty; kept clear of the
+# NBA Finals/preseason and the Super Bowl/Hall of Fame game so no real game day is skipped
+OFFSEASON = {
+    'basketball/nba': ((7, 1), (9, 25)),
+    'football/nfl': ((2, 20), (7, 25)),
+}
+
+# Days fetched concurrently; each request is dominated by network round-trip time
+MAX_CONCURRENT_REQUESTS = 8
+
+# Scoreboards at least this many days old are final and cached forever; newer ones expire
+FINAL_AFTER_DAYS = 2
+RECENT_EXPIRE_SECONDS = 600
+
+# Scoreboard session, created on first use (see get_session)
+_session = None
+
+def get_session():
+    """Return the shared scoreboard session, opening it (and its on-disk cache) on first use
+    
+    Its keep-alive pool is sized for the worker threads; throttled/failed GETs back off
+    (honouring Retry-After).
+    """
+    global _session
+    if _session is None:
+        _session = make_cached_session()
+    return _session
+
+def split_home_away(competitors):
+    """(home, away) from a two-entry ESPN competitors list, or (None, None) if not one of each"""
+    first, second = competitors
+    home, away = (first, second) if first.get('homeAway') == 'home' else (second, first)
+    if home.get('homeAway') == 'home' and away.get('homeAway') == 'away':
+        return home, away
+    return None, None
+
+def fetch_scoreboard_day(sport, current_date, include_week=False):
+    """Fetch all games on one date from the ESPN scoreboard"""
+    date_str = current_date.strftime('%Y-%m-%d')
+    games = []
     
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y-%m-%d')
-        print(f"Fetching NBA games for {date_str}...")
+    try:
+        espn_url = ESPN_SCOREBOARD_URL.format(sport=sport, date=date_str.replace('-', ''))
+        is_final = current_date <= datetime.now().date() - timedelta(days=FINAL_AFTER_DAYS)
+        response = get_session().get(espn_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'},
+                               expire_after=NEVER_EXPIRE if is_final else RECENT_EXPIRE_SECONDS)
         
-        try:
-            # Try ESPN API first (more reliable)
-            espn_url = f"https://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard?dates={date_str.replace('-', '')}"
-            response = requests.get(espn_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            
-            if response.status_code == 200:
-                data = response.json()
-                for event in data.get('events', []):
-                    competitions = event.get('competitions', [])
-                    if competitions:
-                        comp = competitions[0]
-                        competitors = comp.get('competitors', [])
-                        if len(competitors) == 2:
-                            home = next((c for c in competitors if c.get('homeAway') == 'home'), None)
-                            away = next((c for c in competitors if c.get('homeAway') == 'away'), None)
-                            if home and away:
-                                home_team = home.get('team', {}).get('abbreviation', '')
-                                away_team = away.get('team', {}).get('abbreviation', '')
-                                
-                                status = event.get('status', {}).get('type', {})
-                                is_completed = status.get('completed', False)
-                                
-                                home_score = int(home.get('score', 0)) if is_completed else None
-                                away_score = int(away.get('score', 0)) if is_completed else None
-                                
-                                game_data = {
-                                    'date': date_str,
-                                    'home_team': home_team,
-                                    'away_team': away_team,
-                                    'status': 'completed' if is_completed else 'scheduled',
-                                    'home_score': home_score,
-                                    'away_score': away_score
-                                }
-                                
-                                if is_completed and home_score is not None and away_score is not None:
-                                    game_data['winner'] = home_team if home_score > away_score else away_team
-                                
-                                all_games.append(game_data)
-                                print(f"  Found: {away_team} @ {home_team} ({'Final' if is_completed else 'Scheduled'})")
-            
-            # Small delay to avoid rate limiting
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"  Error fetching {date_str}: {e}")
+        if response.status_code == 200:
+            data = parse_json(response.content)
+            for event in data.get('events', []):
+                competitions = event.get('competitions', [])
+                if competitions:
+                    comp = competitions[0]
+                    competitors = comp.get('competitors', [])
+                    if len(competitors) == 2:
+                        home, away = split_home_away(competitors)
+                        if home and away:
+                            home_team = home.get('team', {}).get('abbreviation', '')
+                            away_team = away.get('team', {}).get('abbreviation', '')
+                            
+                            status = event.get('status', {}).get('type', {})
+                            is_completed = status.get('completed', False)
+                            
+                            home_score = int(home.get('score', 0)) if is_completed else None
+                            away_score = int(away.get('score', 0)) if is_completed else None
+                            
+                            game_data = {
+                                'date': date_str,
+                                'home_team': home_team,
+                                'away_team': away_team,
+                                'status': 'completed' if is_completed else 'scheduled',
+                                'home_score': home_score,
+                                'away_score': away_score
+                            }
+                            
+                            if include_week:
+                                # Get week info
+                                game_data['week'] = data.get('week', {}).get('number', None)
+                            
+                            if is_completed and home_score is not None and away_score is not None:
+                                game_data['winner'] = home_team if home_score > away_score else away_team
+                            
+                            games.append(game_data)
         
-        current_date += timedelta(days=1)
+    except Exception as e:
+        print(f"  Error fetching {date_str}: {e}")
+    
+    return games
+
+def in_offseason(sport, day):
+    """True if day falls in the sport's OFFSEASON window (no games to fetch)"""
+    window = OFFSEASON.get(sport)
+    return window is not None and window[0] <= (day.month, day.day) <= window[1]
+
+def fetch_scoreboard_range(sport, label, start_date, end_date, include_week=False):
+    """Fetch every in-season day from start_date to end_date, several days in flight at once"""
+    dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    dates = [day for day in dates if not in_offseason(sport, day)]
+    all_games = []
     
+    get_session()  # open it here so the worker threads share one session
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        day_results = executor.map(lambda day: fetch_scoreboard_day(sport, day, include_week), dates)
+        # map() yields in date order, so logs and output keep their chronological order
+        for day, games in zip(dates, day_results):
+            print(f"Fetched {label} games for {day.strftime('%Y-%m-%d')}")
+            for game in games:
+                print(f"  Found: {game['away_team']} @ {game['home_team']} ({'Final' if game['status'] == 'completed' else 'Scheduled'})")
+            all_games.extend(games)
+    
+    return all_games
+
+def fetch_nba_historical_data(start_date, end_date):
+    """Fetch all NBA games from start_date to end_date"""
+    print(f"\n=== Fetching NBA data from {start_date} to {end_date} ===")
+    all_games = fetch_scoreboard_range('basketball/nba', 'NBA', start_date, end_date)
     print(f"\nTotal NBA games fetched: {len(all_games)}")
     return all_games
 
 def fetch_nfl_historical_data(start_date, end_date):
     """Fetch all NFL games from start_date to end_date"""
     print(f"\n=== Fetching NFL data from {start_date} to {end_date} ===")
-    data_fetcher = NFLDataFetcher()
-    all_games = []
-    
     # NFL games are typically on specific days (Thu, Sun, Mon)
     # But we'll check every day in the range
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y-%m-%d')
-        date_formatted = date_str.replace('-', '')
-        
-        print(f"Fetching NFL games for {date_str}...")
-        
-        try:
-            # Try ESPN API
-            espn_url = f"https://site.api.espn.com/apis/site/v2/sports/football/nfl/scoreboard?dates={date_formatted}"
-            response = requests.get(espn_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            
-            if response.status_code == 200:
-                data = response.json()
-                for event in data.get('events', []):
-                    competitions = event.get('competitions', [])
-                    if competitions:
-                        comp = competitions[0]
-                        competitors = comp.get('competitors', [])
-                        if len(competitors) == 2:
-                            home = next((c for c in competitors if c.get('homeAway') == 'home'), None)
-                            away = next((c for c in competitors if c.get('homeAway') == 'away'), None)
-                            if home and away:
-                                home_team = home.get('team', {}).get('abbreviation', '')
-                                away_team = away.get('team', {}).get('abbreviation', '')
-                                
-                                status = event.get('status', {}).get('type', {})
-                                is_completed = status.get('completed', False)
-                                
-                                home_score = int(home.get('score', 0)) if is_completed else None
-                                away_score = int(away.get('score', 0)) if is_completed else None
-                                
-                                # Get week info
-                                week_info = data.get('week', {})
-                                week = week_info.get('number', None)
-                                
-                                game_data = {
-                                    'date': date_str,
-                                    'home_team': home_team,
-                                    'away_team': away_team,
-                                    'status': 'completed' if is_completed else 'scheduled',
-                                    'home_score': home_score,
-                                    'away_score': away_score,
-                                    'week': week
-                                }
-                                
-                                if is_completed and home_score is not None and away_score is not None:
-                                    game_data['winner'] = home_team if home_score > away_score else away_team
-                                
-                                all_games.append(game_data)
-                                print(f"  Found: {away_team} @ {home_team} ({'Final' if is_completed else 'Scheduled'})")
-            
-            # Small delay to avoid rate limiting
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"  Error fetching {date_str}: {e}")
-        
-        current_date += timedelta(days=1)
-    
+    all_games = fetch_scoreboard_range('football/nfl', 'NFL', start_date, end_date, include_week=True)
     print(f"\nTotal NFL games fetched: {len(all_games)}")
     return all_games
 
 def save_nba_data(games, filename='nba_historical_data.json'):
     """Save NBA games to JSON file"""
-    with open(filename, 'w') as f:
-        json.dump(games, f, indent=2)
+    dump_json(games, filename)
     print(f"\nNBA data saved to {filename}")
 
 def save_nfl_data(games, filename='nfl_historical_data.json'):
     """Save NFL games to JSON file"""
-    with open(filename, 'w') as f:
-        json.dump(games, f, indent=2)
+    dump_json(games, filename)
     print(f"\nNFL data saved to {filename}")
 
 def main():
@@ -0,0 +1,42 @@
+"""
+HTTP Cache Helpers
+Shared keep-alive, retrying and on-disk cached sessions for the fetch and prediction scripts
+"""
+
+import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_cache import CachedSession
+
+# On-disk HTTP cache; point HTTP_CACHE_PATH at a persisted directory to reuse it across runs.
+# The CI workflows check out fresh and don't restore it, so there it only saves repeat calls
+# within a single run
+HTTP_CACHE_PATH = os.environ.get('HTTP_CACHE_PATH', 'http_cache.sqlite')
+
+
+def mount_retrying_adapter(session, pool_size=16, max_retries=None):
+    """Mount a keep-alive adapter on session that retries throttled/failed GETs with backoff
+
+    max_retries defaults to 5 retries of 429/5xx GETs with exponential backoff (honouring
+    Retry-After); pool_size is the number of pooled connections kept per host.
+    """
+    if max_retries is None:
+        max_retries = Retry(total=5, backoff_factor=0.5,
+                            status_forcelist=(429, 500, 502, 503, 504),
+                            allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def make_cached_session(pool_size=16, max_retries=None, **cache_options):
+    """sqlite-backed retrying session that stores 200 responses and serves stale ones if a refresh fails
+
+    cache_options are passed to CachedSession (e.g. expire_after); pool_size and max_retries
+    to mount_retrying_adapter. Opening the session creates the sqlite file, so callers build
+    it on first use rather than at import time.
+    """
+    session = CachedSession(HTTP_CACHE_PATH, backend='sqlite', allowable_codes=(200,),
+                            stale_if_error=True, **cache_options)
+    return mount_retrying_adapter(session, pool_size, max_retries)
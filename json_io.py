@@ -0,0 +1,70 @@
+"""
+JSON I/O Helpers
+Shared loaders/writers for the JSON data files written by the fetch and prediction scripts
+"""
+
+import functools
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder/decoder
+    orjson = None
+
+
+def parse_json(data):
+    """Parse JSON text or bytes, e.g. an HTTP response body (orjson when available)"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def load_json(path):
+    """Load a JSON file (orjson when available)"""
+    with open(path, 'rb') as f:
+        return parse_json(f.read())
+
+
+def _dumps_indented(obj):
+    """Serialize obj as 2-space indented UTF-8 JSON bytes"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, indent=2).encode()
+
+
+def dump_json(obj, path):
+    """Write obj to path as 2-space indented JSON, laid out like json.dump(..., indent=2)
+    
+    The bytes match json.dump for ASCII-only, finite data. With orjson, non-ASCII text is
+    written as raw UTF-8 rather than \\uXXXX escapes, and NaN/Infinity as null.
+    """
+    with open(path, 'wb') as f:
+        f.write(_dumps_indented(obj))
+
+
+def dump_json_stream(items, path):
+    """Write an iterable to path as a JSON array, one element at a time
+
+    Produces the same bytes as dump_json(list(items), path) without holding the
+    whole list in memory. Returns the number of elements written.
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        for item in items:
+            f.write(b',\n  ' if count else b'[\n  ')
+            f.write(_dumps_indented(item).replace(b'\n', b'\n  '))
+            count += 1
+        f.write(b'\n]' if count else b'[]')
+    return count
+
+
+@functools.lru_cache(maxsize=4)
+def _load_json_cached(path, mtime_ns):
+    return load_json(path)
+
+
+def load_json_cached(path):
+    """Load a JSON file, reusing the parsed result until the file's mtime changes.
+
+    The returned object is shared between callers, so treat it as read-only.
+    """
+    return _load_json_cached(path, os.stat(path).st_mtime_ns)
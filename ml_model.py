@@ -3,6 +3,8 @@ NBA Game Prediction Model
 Uses machine learning to predict game outcomes based on team statistics
 """
 
+import collections
+import functools
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
@@ -14,52 +16,104 @@ import kagglehub
 from datetime import datetime, timedelta
 from nba_data_fetcher import NBADataFetcher
 
+# Optional local Parquet copy of the parsed dataset CSV, rebuilt whenever the CSV is newer. Off
+# unless DATASET_PARQUET_PATH is set: it needs pyarrow (or fastparquet), which isn't in
+# requirements.txt, and only pays off where the file persists between runs (not fresh CI checkouts)
+DATASET_PARQUET_PATH = os.environ.get('DATASET_PARQUET_PATH')
+
+# One team's row of team_stats (see NBAGamePredictor.calculate_team_features)
+TeamStats = collections.namedtuple('TeamStats', [
+    'Avg_PTS', 'Avg_AST', 'Avg_TRB', 'Avg_FG_Pct', 'Avg_3P_Pct', 'Avg_FT_Pct',
+    'Win_Pct', 'Avg_GmSc', 'Games_Played'
+])
+
+@functools.lru_cache(maxsize=1)
+def _dataset_dir():
+    """Local path of the Kaggle dataset, resolved once per process"""
+    return kagglehub.dataset_download("eduardopalmieri/nba-player-stats-season-2425")
+
+def _parse_dataset(csv_path, mtime_ns):
+    """Dataset CSV with parsed dates, read from the Parquet copy when enabled and up to date"""
+    # Without a Parquet engine, or if the copy is unreadable, parse the CSV
+    if DATASET_PARQUET_PATH:
+        try:
+            if os.path.exists(DATASET_PARQUET_PATH) and os.stat(DATASET_PARQUET_PATH).st_mtime_ns >= mtime_ns:
+                return pd.read_parquet(DATASET_PARQUET_PATH)
+        except (ImportError, OSError, ValueError):
+            pass
+    
+    df = pd.read_csv(csv_path)
+    # Dates are YYYY-MM-DD and repeat on every player row of a game day, so parse with a fixed
+    # format over the unique strings; fall back to inference if the layout ever changes
+    try:
+        df['Data'] = pd.to_datetime(df['Data'], format='%Y-%m-%d', cache=True)
+    except ValueError:
+        df['Data'] = pd.to_datetime(df['Data'])
+    if DATASET_PARQUET_PATH:
+        try:
+            # Written aside and renamed so a failed write never leaves a partial copy behind
+            df.to_parquet(DATASET_PARQUET_PATH + '.tmp')
+            os.replace(DATASET_PARQUET_PATH + '.tmp', DATASET_PARQUET_PATH)
+        except Exception as e:
+            print(f"Could not cache dataset as Parquet: {e}")
+    return df
+
+@functools.lru_cache(maxsize=4)
+def _read_dataset(csv_path, mtime_ns):
+    """Parse the dataset CSV; cached until the file's mtime changes"""
+    df = _parse_dataset(csv_path, mtime_ns)
+    
+    # Sorted by date once (stable, so same-day rows keep file order); per-team code takes
+    # each team's recent games straight from this order instead of sorting again
+    df = df.sort_values('Data', kind='mergesort').reset_index(drop=True)
+    
+    # Team and result columns as categoricals so equality masks compare small integer codes
+    team_dtype = pd.CategoricalDtype(categories=sorted(set(df['Tm'].dropna()) | set(df['Opp'].dropna())))
+    df['Tm'] = df['Tm'].astype(team_dtype)
+    df['Opp'] = df['Opp'].astype(team_dtype)
+    df['Res'] = df['Res'].astype('category')
+    return df
+
 class NBAGamePredictor:
     def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10)
+        # 16 low-cardinality features: returns flatten out well before 100 trees/depth 10;
+        # trees are built (and evaluated) in parallel across all cores
+        self.model = RandomForestClassifier(n_estimators=50, random_state=42, max_depth=8,
+                                            max_features='sqrt', n_jobs=-1)
         self.team_stats = None
+        self._team_stats_dict = None
         self.is_trained = False
         
     def load_data(self):
         """Load and prepare the dataset"""
         print("Loading dataset...")
-        path = kagglehub.dataset_download("eduardopalmieri/nba-player-stats-season-2425")
-        df = pd.read_csv(os.path.join(path, "database_24_25.csv"))
-        df['Data'] = pd.to_datetime(df['Data'])
-        return df
+        csv_path = os.path.join(_dataset_dir(), "database_24_25.csv")
+        # Copy so callers can't modify the cached frame
+        return _read_dataset(csv_path, os.stat(csv_path).st_mtime_ns).copy()
     
     def calculate_team_features(self, df):
-        """Calculate team-level features for prediction"""
+        """Calculate team-level features for prediction (df sorted by date, as load_data returns it)"""
         print("Calculating team features...")
         
-        # Get recent games (last 10 games) for each team
-        team_features = []
-        
-        # Calculate rolling statistics for each team
-        for team in df['Tm'].unique():
-            team_games = df[df['Tm'] == team].sort_values('Data')
-            
-            # Calculate recent performance metrics
-            recent_games = team_games.tail(10)
-            
-            if len(recent_games) < 5:
-                continue
-                
-            features = {
-                'Team': team,
-                'Avg_PTS': recent_games['PTS'].sum() / len(recent_games),
-                'Avg_AST': recent_games['AST'].sum() / len(recent_games),
-                'Avg_TRB': recent_games['TRB'].sum() / len(recent_games),
-                'Avg_FG_Pct': recent_games['FG%'].mean(),
-                'Avg_3P_Pct': recent_games['3P%'].mean(),
-                'Avg_FT_Pct': recent_games['FT%'].mean(),
-                'Win_Pct': (recent_games['Res'] == 'W').sum() / len(recent_games),
-                'Avg_GmSc': recent_games['GmSc'].mean(),
-                'Games_Played': len(recent_games)
-            }
-            team_features.append(features)
-        
-        return pd.DataFrame(team_features)
+        # Get recent games (last 10 games) for each team; df is already in date order
+        recent_games = df.groupby('Tm', observed=True).tail(10)
+        
+        # Calculate recent performance metrics for every team in one pass
+        team_features = recent_games.assign(Win=recent_games['Res'] == 'W').groupby('Tm', sort=False, observed=True).agg(
+            Avg_PTS=('PTS', 'mean'),
+            Avg_AST=('AST', 'mean'),
+            Avg_TRB=('TRB', 'mean'),
+            Avg_FG_Pct=('FG%', 'mean'),
+            Avg_3P_Pct=('3P%', 'mean'),
+            Avg_FT_Pct=('FT%', 'mean'),
+            Win_Pct=('Win', 'mean'),
+            Avg_GmSc=('GmSc', 'mean'),
+            Games_Played=('PTS', 'size')
+        )
+        team_features = team_features[team_features['Games_Played'] >= 5]
+        team_features.index = team_features.index.astype(object)
+        
+        return team_features.rename_axis('Team').reset_index()
     
     def create_game_features(self, df):
         """Create features for each game"""
@@ -68,58 +122,45 @@ class NBAGamePredictor:
         # Calculate team stats
         team_stats = self.calculate_team_features(df)
         self.team_stats = team_stats.set_index('Team')
+        self._index_team_stats()
         
-        # Create game-level dataset
-        games = []
-        
-        # Group by date and get unique matchups
-        for date in df['Data'].unique():
-            date_games = df[df['Data'] == date]
-            
-            # Get unique team matchups
-            matchups = date_games.groupby(['Tm', 'Opp']).first().reset_index()
-            
-            for _, matchup in matchups.iterrows():
-                home_team = matchup['Tm']
-                away_team = matchup['Opp']
-                
-                if home_team not in self.team_stats.index or away_team not in self.team_stats.index:
-                    continue
-                
-                # Get team stats
-                home_stats = self.team_stats.loc[home_team]
-                away_stats = self.team_stats.loc[away_team]
-                
-                # Get actual result
-                game_result = date_games[(date_games['Tm'] == home_team) & 
-                                        (date_games['Opp'] == away_team)]['Res'].iloc[0]
-                
-                # Create feature vector
-                features = {
-                    'Date': date,
-                    'Home_Team': home_team,
-                    'Away_Team': away_team,
-                    'Home_PTS': home_stats['Avg_PTS'],
-                    'Away_PTS': away_stats['Avg_PTS'],
-                    'Home_AST': home_stats['Avg_AST'],
-                    'Away_AST': away_stats['Avg_AST'],
-                    'Home_TRB': home_stats['Avg_TRB'],
-                    'Away_TRB': away_stats['Avg_TRB'],
-                    'Home_FG_Pct': home_stats['Avg_FG_Pct'],
-                    'Away_FG_Pct': away_stats['Avg_FG_Pct'],
-                    'Home_3P_Pct': home_stats['Avg_3P_Pct'],
-                    'Away_3P_Pct': away_stats['Avg_3P_Pct'],
-                    'Home_Win_Pct': home_stats['Win_Pct'],
-                    'Away_Win_Pct': away_stats['Win_Pct'],
-                    'Home_GmSc': home_stats['Avg_GmSc'],
-                    'Away_GmSc': away_stats['Avg_GmSc'],
-                    'PTS_Diff': home_stats['Avg_PTS'] - away_stats['Avg_PTS'],
-                    'Win_Pct_Diff': home_stats['Win_Pct'] - away_stats['Win_Pct'],
-                    'Result': 1 if game_result == 'W' else 0  # 1 if home team wins
-                }
-                games.append(features)
-        
-        return pd.DataFrame(games)
+        # Unique (date, team, opponent) matchups with the first row's result, ordered as
+        # dates by first appearance, then by team and opponent within each date
+        matchups = df.groupby(['Data', 'Tm', 'Opp'], observed=True).agg(Res=('Res', 'first')).reset_index()
+        date_order = pd.Index(df['Data'].unique()).get_indexer(matchups['Data'])
+        matchups = matchups.iloc[np.argsort(date_order, kind='stable')]
+        
+        # Skip matchups where either team has no stats
+        known = matchups['Tm'].isin(self.team_stats.index) & matchups['Opp'].isin(self.team_stats.index)
+        matchups = matchups[known]
+        
+        # Get team stats for every matchup at once
+        home = {col: values.to_numpy() for col, values in self.team_stats.loc[matchups['Tm']].items()}
+        away = {col: values.to_numpy() for col, values in self.team_stats.loc[matchups['Opp']].items()}
+        
+        # Create feature vectors
+        return pd.DataFrame({
+            'Date': matchups['Data'].to_numpy(),
+            'Home_Team': matchups['Tm'].to_numpy(dtype=object),
+            'Away_Team': matchups['Opp'].to_numpy(dtype=object),
+            'Home_PTS': home['Avg_PTS'],
+            'Away_PTS': away['Avg_PTS'],
+            'Home_AST': home['Avg_AST'],
+            'Away_AST': away['Avg_AST'],
+            'Home_TRB': home['Avg_TRB'],
+            'Away_TRB': away['Avg_TRB'],
+            'Home_FG_Pct': home['Avg_FG_Pct'],
+            'Away_FG_Pct': away['Avg_FG_Pct'],
+            'Home_3P_Pct': home['Avg_3P_Pct'],
+            'Away_3P_Pct': away['Avg_3P_Pct'],
+            'Home_Win_Pct': home['Win_Pct'],
+            'Away_Win_Pct': away['Win_Pct'],
+            'Home_GmSc': home['Avg_GmSc'],
+            'Away_GmSc': away['Avg_GmSc'],
+            'PTS_Diff': home['Avg_PTS'] - away['Avg_PTS'],
+            'Win_Pct_Diff': home['Win_Pct'] - away['Win_Pct'],
+            'Result': (matchups['Res'] == 'W').to_numpy().astype(np.int64)  # 1 if home team wins
+        })
     
     def train(self, df):
         """Train the prediction model"""
@@ -133,7 +174,8 @@ class NBAGamePredictor:
                        'Home_3P_Pct', 'Away_3P_Pct', 'Home_Win_Pct', 'Away_Win_Pct',
                        'Home_GmSc', 'Away_GmSc', 'PTS_Diff', 'Win_Pct_Diff']
         
-        X = games_df[feature_cols]
+        # float32 is what the trees compare against internally; casting here skips sklearn's copy
+        X = games_df[feature_cols].astype(np.float32)
         y = games_df['Result']
         
         # Split data
@@ -154,68 +196,84 @@ class NBAGamePredictor:
         
         return accuracy
     
+    def _index_team_stats(self):
+        """Index team_stats as {team: TeamStats}; plain dict lookups avoid .loc overhead when predicting"""
+        rows = self.team_stats[list(TeamStats._fields)].itertuples(index=False, name=None)
+        self._team_stats_dict = dict(zip(self.team_stats.index, map(TeamStats._make, rows)))
+    
     def predict_game(self, home_team, away_team, injury_data=None):
         """Predict outcome of a specific game with optional injury data"""
+        return self.predict_games([(home_team, away_team)], [injury_data])[0]
+    
+    def predict_games(self, pairs, injury_data=None):
+        """Predict many (home_team, away_team) games with one predict_proba call
+        
+        injury_data, if given, is a list aligned with pairs of the per-game dicts
+        accepted by predict_game (or None for no adjustment).
+        """
         if not self.is_trained or self.team_stats is None:
             raise ValueError("Model must be trained first")
         
-        if home_team not in self.team_stats.index or away_team not in self.team_stats.index:
-            raise ValueError(f"Team data not available for {home_team} or {away_team}")
+        for home_team, away_team in pairs:
+            if home_team not in self._team_stats_dict or away_team not in self._team_stats_dict:
+                raise ValueError(f"Team data not available for {home_team} or {away_team}")
         
-        home_stats = self.team_stats.loc[home_team]
-        away_stats = self.team_stats.loc[away_team]
+        if not pairs:
+            return []
         
-        # Apply injury adjustments if provided
-        home_injury_factor = 1.0
-        away_injury_factor = 1.0
+        # Team stats for every game as column arrays, e.g. home_stats.Avg_PTS[i] for game i
+        home_stats = TeamStats._make(map(np.array, zip(*(self._team_stats_dict[home] for home, _ in pairs))))
+        away_stats = TeamStats._make(map(np.array, zip(*(self._team_stats_dict[away] for _, away in pairs))))
         
-        if injury_data:
-            home_injury_factor = injury_data.get('home_injury_factor', 1.0)
-            away_injury_factor = injury_data.get('away_injury_factor', 1.0)
+        # Apply injury adjustments if provided
+        injury_data = injury_data or [None] * len(pairs)
+        home_injury_factor = np.array([(inj or {}).get('home_injury_factor', 1.0) for inj in injury_data])
+        away_injury_factor = np.array([(inj or {}).get('away_injury_factor', 1.0) for inj in injury_data])
         
         # Adjust stats based on injuries
-        home_pts = home_stats['Avg_PTS'] * home_injury_factor
-        away_pts = away_stats['Avg_PTS'] * away_injury_factor
-        home_ast = home_stats['Avg_AST'] * home_injury_factor
-        away_ast = away_stats['Avg_AST'] * away_injury_factor
-        home_trb = home_stats['Avg_TRB'] * home_injury_factor
-        away_trb = away_stats['Avg_TRB'] * away_injury_factor
-        home_gmsc = home_stats['Avg_GmSc'] * home_injury_factor
-        away_gmsc = away_stats['Avg_GmSc'] * away_injury_factor
-        
-        features = np.array([[
+        home_pts = home_stats.Avg_PTS * home_injury_factor
+        away_pts = away_stats.Avg_PTS * away_injury_factor
+        home_win_pct = home_stats.Win_Pct
+        away_win_pct = away_stats.Win_Pct
+        
+        # Features are derived in float64, then handed to the trees as the float32 they use internally
+        features = np.column_stack([
             home_pts,
             away_pts,
-            home_ast,
-            away_ast,
-            home_trb,
-            away_trb,
-            home_stats['Avg_FG_Pct'],
-            away_stats['Avg_FG_Pct'],
-            home_stats['Avg_3P_Pct'],
-            away_stats['Avg_3P_Pct'],
-            home_stats['Win_Pct'],
-            away_stats['Win_Pct'],
-            home_gmsc,
-            away_gmsc,
+            home_stats.Avg_AST * home_injury_factor,
+            away_stats.Avg_AST * away_injury_factor,
+            home_stats.Avg_TRB * home_injury_factor,
+            away_stats.Avg_TRB * away_injury_factor,
+            home_stats.Avg_FG_Pct,
+            away_stats.Avg_FG_Pct,
+            home_stats.Avg_3P_Pct,
+            away_stats.Avg_3P_Pct,
+            home_win_pct,
+            away_win_pct,
+            home_stats.Avg_GmSc * home_injury_factor,
+            away_stats.Avg_GmSc * away_injury_factor,
             home_pts - away_pts,
-            home_stats['Win_Pct'] - away_stats['Win_Pct']
-        ]])
-        
-        prediction = self.model.predict(features)[0]
-        probability = self.model.predict_proba(features)[0]
-        
-        winner = home_team if prediction == 1 else away_team
-        confidence = probability[1] if prediction == 1 else probability[0]
-        
-        return {
-            'winner': winner,
-            'confidence': float(confidence),
-            'home_win_prob': float(probability[1]),
-            'away_win_prob': float(probability[0]),
-            'home_injury_factor': home_injury_factor,
-            'away_injury_factor': away_injury_factor
-        }
+            home_win_pct - away_win_pct
+        ]).astype(np.float32)
+        
+        # predict() is argmax over predict_proba, so derive it instead of a second pass
+        probabilities = self.model.predict_proba(features)
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        
+        results = []
+        for i, (home_team, away_team) in enumerate(pairs):
+            probability = probabilities[i]
+            winner = home_team if predictions[i] == 1 else away_team
+            confidence = probability[1] if predictions[i] == 1 else probability[0]
+            results.append({
+                'winner': winner,
+                'confidence': float(confidence),
+                'home_win_prob': float(probability[1]),
+                'away_win_prob': float(probability[0]),
+                'home_injury_factor': float(home_injury_factor[i]),
+                'away_injury_factor': float(away_injury_factor[i])
+            })
+        return results
     
     def save_model(self, filepath='nba_model.pkl'):
         """Save the trained model"""
@@ -234,6 +292,7 @@ class NBAGamePredictor:
             self.model = data['model']
             self.team_stats = data['team_stats']
             self.is_trained = data['is_trained']
+        self._index_team_stats()
         print(f"Model loaded from {filepath}")
 
 if __name__ == "__main__":
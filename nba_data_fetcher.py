@@ -4,14 +4,60 @@ Fetches injuries, rosters, and game data from APIs
 """
 
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import time
 import json
+from http_cache import mount_retrying_adapter
+
+def _make_session():
+    """Keep-alive session that retries throttled/failed GETs with backoff (honouring Retry-After)"""
+    return mount_retrying_adapter(requests.Session())
+
+# Injury adjustment factor based on roster depth: (min unique players, min regular rotation
+# players, factor), checked in order. Full strength: 10+ unique players, 8+ regular rotation players
+INJURY_FACTOR_LADDER = [
+    (10, 8, 1.0),
+    (9, 7, 0.95),
+    (8, 6, 0.90),
+    (7, 5, 0.85),
+    (6, 0, 0.80),
+    (5, 0, 0.75),
+]
+MIN_INJURY_FACTOR = 0.70
+
+def injury_factors(unique_players, regular_players):
+    """Injury factor for each (unique_players, regular_players) pair; accepts scalars or arrays"""
+    unique_players = np.asarray(unique_players)
+    regular_players = np.asarray(regular_players)
+    conditions = [(unique_players >= min_unique) & (regular_players >= min_regular)
+                  for min_unique, min_regular, _ in INJURY_FACTOR_LADDER]
+    return np.select(conditions, [factor for _, _, factor in INJURY_FACTOR_LADDER], default=MIN_INJURY_FACTOR)
 
 class NBADataFetcher:
+    # Shared by every fetcher so repeat calls reuse pooled connections (see clear_session)
+    session = _make_session()
+    
     def __init__(self):
         self.base_url = "https://www.balldontlie.io/api/v1"
+        self._teams_cache = None
+        self._strengths = None
+        self._strengths_source = None
+    
+    @classmethod
+    def clear_session(cls):
+        """Drop pooled connections and start a fresh session, e.g. after being rate limited"""
+        cls.session.close()
+        cls.session = _make_session()
+    
+    def _get_teams(self):
+        """Teams keyed by abbreviation, fetched from /teams once per fetcher"""
+        if self._teams_cache is None:
+            teams_response = self.session.get(f"{self.base_url}/teams", timeout=10)
+            if teams_response.status_code != 200:
+                return {}  # not cached, so a later call retries
+            self._teams_cache = {team['abbreviation']: team for team in teams_response.json().get('data', [])}
+        return self._teams_cache
         
     def get_injuries(self, date=None):
         """Get injury reports for a specific date"""
@@ -21,23 +67,14 @@ class NBADataFetcher:
         injuries = {}
         
         try:
-            # Get all teams
-            teams_response = requests.get(f"{self.base_url}/teams", timeout=10)
-            if teams_response.status_code == 200:
-                teams_data = teams_response.json()
-                
-                # For each team, try to get injury info
-                # Note: balldontlie doesn't have direct injury endpoint
-                # We'll use a workaround with player stats
-                for team in teams_data.get('data', [])[:30]:  # Limit to avoid rate limits
-                    team_abbr = team['abbreviation']
-                    injuries[team_abbr] = {
-                        'injured_players': [],
-                        'injury_count': 0
-                    }
-                    
-                    # Small delay to avoid rate limiting
-                    time.sleep(0.1)
+            # For each team, try to get injury info
+            # Note: balldontlie doesn't have direct injury endpoint
+            # We'll use a workaround with player stats
+            for team_abbr in list(self._get_teams())[:30]:  # Limit to avoid rate limits
+                injuries[team_abbr] = {
+                    'injured_players': [],
+                    'injury_count': 0
+                }
         except Exception as e:
             print(f"Error fetching injuries: {e}")
         
@@ -47,24 +84,18 @@ class NBADataFetcher:
         """Get current roster for a team"""
         try:
             # Get team ID first
-            teams_response = requests.get(f"{self.base_url}/teams", timeout=10)
-            if teams_response.status_code == 200:
-                teams_data = teams_response.json()
-                team_id = None
-                for team in teams_data.get('data', []):
-                    if team['abbreviation'] == team_abbr:
-                        team_id = team['id']
-                        break
-                
-                if team_id:
-                    # Get players for this team (current season)
-                    players_response = requests.get(
-                        f"{self.base_url}/players?team_ids[]={team_id}&per_page=100",
-                        timeout=10
-                    )
-                    if players_response.status_code == 200:
-                        players_data = players_response.json()
-                        return [p['id'] for p in players_data.get('data', [])]
+            team = self._get_teams().get(team_abbr)
+            team_id = team['id'] if team else None
+            
+            if team_id:
+                # Get players for this team (current season)
+                players_response = self.session.get(
+                    f"{self.base_url}/players?team_ids[]={team_id}&per_page=100",
+                    timeout=10
+                )
+                if players_response.status_code == 200:
+                    players_data = players_response.json()
+                    return [p['id'] for p in players_data.get('data', [])]
         except Exception as e:
             print(f"Error fetching roster for {team_abbr}: {e}")
         
@@ -76,7 +107,7 @@ class NBADataFetcher:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days)
             
-            stats_response = requests.get(
+            stats_response = self.session.get(
                 f"{self.base_url}/stats?player_ids[]={player_id}&start_date={start_date}&end_date={end_date}&per_page=100",
                 timeout=10
             )
@@ -88,67 +119,55 @@ class NBADataFetcher:
         
         return 0
     
-    def calculate_team_strength_with_injuries(self, team_abbr, df):
-        """Calculate team strength accounting for injuries"""
-        # Get team's recent performance
-        team_games = df[df['Tm'] == team_abbr].sort_values('Data')
-        recent_games = team_games.tail(10)
+    def precompute_all_strengths(self, df):
+        """Calculate every team's strength, accounting for injuries, in one pass over df
         
-        if len(recent_games) < 5:
-            return None
+        df must be sorted by date, as NBAGamePredictor.load_data returns it.
+        """
+        # Get each team's recent performance: last 10 rows in date order
+        recent_games = df.groupby('Tm', observed=True).tail(10)
+        by_team = recent_games.assign(Win=recent_games['Res'] == 'W').groupby('Tm', observed=True)
         
         # Base strength metrics
-        base_strength = {
-            'avg_pts': recent_games['PTS'].sum() / len(recent_games),
-            'avg_ast': recent_games['AST'].sum() / len(recent_games),
-            'avg_trb': recent_games['TRB'].sum() / len(recent_games),
-            'win_pct': (recent_games['Res'] == 'W').sum() / len(recent_games),
-            'avg_gmsc': recent_games['GmSc'].mean()
-        }
-        
-        # Try to get roster and check for injuries
-        roster = self.get_team_roster(team_abbr)
-        
-        # Estimate injury impact using recent game participation
-        # Count unique players who appeared in recent games
-        unique_players = recent_games['Player'].nunique()
-        
-        # Count players who appeared in multiple recent games (regular rotation)
-        player_appearances = recent_games.groupby('Player').size()
-        regular_players = len(player_appearances[player_appearances >= 3])  # Played in 3+ of last 10
+        strengths = by_team.agg(
+            avg_pts=('PTS', 'mean'),
+            avg_ast=('AST', 'mean'),
+            avg_trb=('TRB', 'mean'),
+            win_pct=('Win', 'mean'),
+            avg_gmsc=('GmSc', 'mean'),
+            games=('PTS', 'size')
+        )
+        strengths = strengths[strengths['games'] >= 5]
         
-        # Active players = unique players in recent games
-        active_players = unique_players
-        
-        # Injury adjustment factor based on roster depth
-        # Full strength: 10+ unique players, 8+ regular rotation players
-        if unique_players >= 10 and regular_players >= 8:
-            injury_factor = 1.0
-        elif unique_players >= 9 and regular_players >= 7:
-            injury_factor = 0.95
-        elif unique_players >= 8 and regular_players >= 6:
-            injury_factor = 0.90
-        elif unique_players >= 7 and regular_players >= 5:
-            injury_factor = 0.85
-        elif unique_players >= 6:
-            injury_factor = 0.80
-        elif unique_players >= 5:
-            injury_factor = 0.75
-        else:
-            injury_factor = 0.70  # Minimum factor
+        # Estimate injury impact using recent game participation:
+        # unique players who appeared in recent games, and players who appeared in
+        # 3+ of the last 10 (regular rotation)
+        unique_players = by_team['Player'].nunique().reindex(strengths.index)
+        player_appearances = recent_games.groupby(['Tm', 'Player'], observed=True).size()
+        regular_players = (player_appearances >= 3).groupby(level='Tm', observed=True).sum()
+        regular_players = regular_players.reindex(strengths.index, fill_value=0)
         
         # Adjust strength metrics
-        adjusted_strength = {
-            'avg_pts': base_strength['avg_pts'] * injury_factor,
-            'avg_ast': base_strength['avg_ast'] * injury_factor,
-            'avg_trb': base_strength['avg_trb'] * injury_factor,
-            'win_pct': base_strength['win_pct'],
-            'avg_gmsc': base_strength['avg_gmsc'] * injury_factor,
+        injury_factor = injury_factors(unique_players.to_numpy(), regular_players.to_numpy())
+        adjusted = pd.DataFrame({
+            'avg_pts': strengths['avg_pts'].to_numpy() * injury_factor,
+            'avg_ast': strengths['avg_ast'].to_numpy() * injury_factor,
+            'avg_trb': strengths['avg_trb'].to_numpy() * injury_factor,
+            'win_pct': strengths['win_pct'].to_numpy(),
+            'avg_gmsc': strengths['avg_gmsc'].to_numpy() * injury_factor,
             'injury_factor': injury_factor,
-            'active_players': active_players
-        }
+            'active_players': unique_players.to_numpy()
+        }, index=strengths.index.astype(object))
         
-        return adjusted_strength
+        self._strengths = adjusted.to_dict('index')
+        self._strengths_source = df
+        return self._strengths
+    
+    def calculate_team_strength_with_injuries(self, team_abbr, df):
+        """Calculate team strength accounting for injuries (None if under 5 recent games)"""
+        if self._strengths_source is not df:
+            self.precompute_all_strengths(df)
+        return self._strengths.get(team_abbr)
     
     def get_game_with_injuries(self, home_team, away_team, df):
         """Get game prediction data including injury impact"""
@@ -190,7 +209,7 @@ class NBADataFetcher:
         try:
             # ESPN API endpoint for NBA scores
             espn_url = f"https://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard?dates={date.replace('-', '')}"
-            response = requests.get(espn_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+            response = self.session.get(espn_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
             if response.status_code == 200:
                 data = response.json()
                 results = []
@@ -232,7 +251,7 @@ class NBADataFetcher:
         # Fallback to balldontlie
         try:
             url = f"{self.base_url}/games?dates[]={date}"
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 results = []
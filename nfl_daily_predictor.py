@@ -3,11 +3,12 @@ NFL Weekly Prediction Script
 Generates predictions for all games in the current week
 """
 
-import json
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from nfl_ml_model import NFLGamePredictor
 from nfl_data_fetcher import NFLDataFetcher
+from json_io import load_json, load_json_cached, dump_json
 
 STATS_FILE = 'nfl_prediction_stats.json'
 PREDICTIONS_FILE = 'nfl_daily_predictions.json'
@@ -15,8 +16,7 @@ PREDICTIONS_FILE = 'nfl_daily_predictions.json'
 def load_stats():
     """Load current statistics"""
     if os.path.exists(STATS_FILE):
-        with open(STATS_FILE, 'r') as f:
-            return json.load(f)
+        return load_json(STATS_FILE)
     return {
         'total_predictions': 0,
         'correct_predictions': 0,
@@ -25,8 +25,7 @@ def load_stats():
 
 def save_stats(stats):
     """Save statistics to file"""
-    with open(STATS_FILE, 'w') as f:
-        json.dump(stats, f, indent=2)
+    dump_json(stats, STATS_FILE)
 
 def get_week_games(data_fetcher):
     """Get current week's games"""
@@ -35,6 +34,7 @@ def get_week_games(data_fetcher):
     # Fallback: Generate games if API doesn't return any
     if not games:
         from datetime import datetime, timedelta
+        from itertools import combinations
         import random
         
         # Calculate current week
@@ -54,66 +54,75 @@ def get_week_games(data_fetcher):
         sunday = (week_start + timedelta(days=3)).date()
         monday = (week_start + timedelta(days=4)).date()
         
-        # Generate 12-14 games
+        # Generate 12-14 games: distinct matchups sampled from every pairing, home side at random
         num_games = random.randint(12, 14)
         generated_games = []
-        used_matchups = set()
         
-        for i in range(num_games):
-            home = random.choice(teams)
-            away = random.choice([t for t in teams if t != home])
-            matchup = tuple(sorted([home, away]))
+        for i, matchup in enumerate(random.sample(list(combinations(teams, 2)), num_games)):
+            home, away = matchup if random.random() < 0.5 else matchup[::-1]
+            if i < 2:
+                game_date = thursday
+                day = 'Thursday'
+            elif i < 12:
+                game_date = sunday
+                day = 'Sunday'
+            else:
+                game_date = monday
+                day = 'Monday'
             
-            if matchup not in used_matchups:
-                used_matchups.add(matchup)
-                if len(generated_games) < 2:
-                    game_date = thursday
-                    day = 'Thursday'
-                elif len(generated_games) < 12:
-                    game_date = sunday
-                    day = 'Sunday'
-                else:
-                    game_date = monday
-                    day = 'Monday'
-                
-                generated_games.append({
-                    'home_team': home,
-                    'away_team': away,
-                    'date': game_date.isoformat(),
-                    'week': week,
-                    'season': 2025
-                })
+            generated_games.append({
+                'home_team': home,
+                'away_team': away,
+                'date': game_date.isoformat(),
+                'week': week,
+                'season': 2025
+            })
         
         print(f"Generated {len(generated_games)} fallback games for Week {week}")
         return generated_games
     
     return games
 
+def index_pending_predictions(history):
+    """Predictions without an actual result, grouped by (home, away) in history order"""
+    pending = {}
+    for pred in history:
+        if pred.get('actual') is None:
+            pending.setdefault((pred.get('home_team'), pred.get('away_team')), []).append(pred)
+    return pending
+
+def take_pending_prediction(pending, result, match_week=False):
+    """Remove and return the first pending prediction for result's game (and week), or None"""
+    candidates = pending.get((result['home_team'], result['away_team']), [])
+    for i, pred in enumerate(candidates):
+        if not match_week or pred.get('week') == result['week']:
+            return candidates.pop(i)
+    return None
+
 def update_accuracy(df, predictor, data_fetcher):
     """Update accuracy from completed games"""
     stats = load_stats()
     
+    # Unprocessed predictions indexed once, so each result is a dict lookup rather than
+    # a scan of the whole history; processed ones are removed so they aren't counted twice
+    pending = index_pending_predictions(stats.get('predictions_history', []))
+    if not pending:
+        return stats  # nothing to score, so no results to fetch and nothing to save
+    changed = False
+    
     # First check historical data file (most up-to-date)
     historical_results = []
     if os.path.exists('nfl_historical_data.json'):
         try:
-            with open('nfl_historical_data.json', 'r') as f:
-                historical_data = json.load(f)
-                historical_results = [g for g in historical_data if g.get('status') == 'completed' and g.get('winner')]
+            historical_data = load_json_cached('nfl_historical_data.json')
+            historical_results = [g for g in historical_data if g.get('status') == 'completed' and g.get('winner')]
         except Exception as e:
             print(f"Error loading NFL historical data: {e}")
     
     # Process historical results
     for result in historical_results:
-        # Check if we predicted this game
-        predicted = None
-        for pred in stats.get('predictions_history', []):
-            if (pred.get('home_team') == result['home_team'] and 
-                pred.get('away_team') == result['away_team']):
-                # Check if we haven't already processed this
-                if 'actual' not in pred or pred.get('actual') is None:
-                    predicted = pred
-                    break
+        # Check if we predicted this game (and haven't already processed it)
+        predicted = take_pending_prediction(pending, result)
         
         if predicted:
             correct = predicted['predicted'] == result['winner']
@@ -123,6 +132,7 @@ def update_accuracy(df, predictor, data_fetcher):
             if correct:
                 stats['correct_predictions'] += 1
             stats['total_predictions'] += 1
+            changed = True
     
     # Get last week's results from API as backup
     try:
@@ -134,15 +144,7 @@ def update_accuracy(df, predictor, data_fetcher):
                 
                 for result in results:
                     # Check if we predicted this game and haven't processed it yet
-                    predicted = None
-                    for pred in stats.get('predictions_history', []):
-                        if (pred.get('home_team') == result['home_team'] and 
-                            pred.get('away_team') == result['away_team'] and
-                            pred.get('week') == result['week']):
-                            # Only process if not already done
-                            if 'actual' not in pred or pred.get('actual') is None:
-                                predicted = pred
-                                break
+                    predicted = take_pending_prediction(pending, result, match_week=True)
                     
                     if predicted:
                         correct = predicted['predicted'] == result['winner']
@@ -152,10 +154,12 @@ def update_accuracy(df, predictor, data_fetcher):
                         if correct:
                             stats['correct_predictions'] += 1
                         stats['total_predictions'] += 1
+                        changed = True
     except Exception as e:
         print(f"Error updating accuracy from API: {e}")
     
-    save_stats(stats)
+    if changed:
+        save_stats(stats)
     return stats
 
 def generate_week_predictions():
@@ -164,21 +168,26 @@ def generate_week_predictions():
     predictor = NFLGamePredictor()
     data_fetcher = NFLDataFetcher()
     
+    # Injury reports don't depend on anything below, so fetch them in the background
+    # while the model loads and accuracy/schedule requests are in flight
+    executor = ThreadPoolExecutor(max_workers=1)
+    injuries_future = executor.submit(data_fetcher.get_injuries)
+    executor.shutdown(wait=False)  # the submitted fetch still runs to completion
+    
+    # Load data once; predictions rebuild team features from it, and training reuses it
+    df = predictor.load_data()
+    print(f"Loaded {len(df)} game records")
+    
     # Try to load model, otherwise train
     try:
         predictor.load_model('nfl_model.pkl')
         print("Model loaded successfully")
     except:
         print("Training new model...")
-        df = predictor.load_data()
         predictor.train(df)
         predictor.save_model('nfl_model.pkl')
         print("Model trained and saved")
     
-    # Load data
-    df = predictor.load_data()
-    print(f"Loaded {len(df)} game records")
-    
     # Update accuracy from completed games
     print("Updating accuracy from completed games...")
     try:
@@ -198,10 +207,10 @@ def generate_week_predictions():
     print("Fetching injury data...")
     
     # Get injuries
-    injuries = data_fetcher.get_injuries()
+    injuries = injuries_future.result()
     
-    # Generate predictions
-    predictions = []
+    # Injury data for every game first, then one batched model call for the whole week
+    batch = []
     for game in week_games:
         try:
             home_team = game['home_team']
@@ -215,29 +224,54 @@ def generate_week_predictions():
                 away_team: away_injuries
             }
             
-            # Predict
-            pred = predictor.predict(home_team, away_team, df, game_injuries)
-            
-            if pred:
-                pred['home_team'] = home_team
-                pred['away_team'] = away_team
-                pred['date'] = game.get('date', '')
-                pred['week'] = game.get('week', 1)
-                pred['season'] = game.get('season', 2025)
-                
-                predictions.append(pred)
-                
-                print(f"Predicted: {away_team} @ {home_team} -> {pred['winner']} ({(pred['confidence']*100):.1f}%)")
+            batch.append((game, game_injuries))
         except Exception as e:
             print(f"Error predicting {game}: {e}")
             import traceback
             traceback.print_exc()
     
+    # Predict
+    try:
+        batch_preds = predictor.predict_games(
+            [(game['home_team'], game['away_team']) for game, _ in batch],
+            df,
+            [game_injuries for _, game_injuries in batch]
+        )
+    except Exception:
+        # Predict one game at a time so a failure only skips (and reports) that game
+        batch_preds = None
+    
+    if batch_preds is None:
+        batch_preds = []
+        for game, game_injuries in batch:
+            try:
+                batch_preds.append(predictor.predict(game['home_team'], game['away_team'], df, game_injuries))
+            except Exception as e:
+                batch_preds.append(None)
+                print(f"Error predicting {game}: {e}")
+                import traceback
+                traceback.print_exc()
+    
+    # Generate predictions
+    predictions = []
+    for (game, _), pred in zip(batch, batch_preds):
+        if pred:
+            home_team = game['home_team']
+            away_team = game['away_team']
+            pred['home_team'] = home_team
+            pred['away_team'] = away_team
+            pred['date'] = game.get('date', '')
+            pred['week'] = game.get('week', 1)
+            pred['season'] = game.get('season', 2025)
+            
+            predictions.append(pred)
+            
+            print(f"Predicted: {away_team} @ {home_team} -> {pred['winner']} ({(pred['confidence']*100):.1f}%)")
+    
     # Load existing predictions and merge (keep only current week)
     existing_predictions = []
     if os.path.exists(PREDICTIONS_FILE):
-        with open(PREDICTIONS_FILE, 'r') as f:
-            existing_predictions = json.load(f)
+        existing_predictions = load_json(PREDICTIONS_FILE)
     
     # Remove old predictions for current week (if regenerating)
     current_week = week_games[0].get('week', 1) if week_games else 1
@@ -248,8 +282,7 @@ def generate_week_predictions():
     
     # Save all predictions (sorted by week, most recent first)
     existing_predictions.sort(key=lambda x: (x.get('season', 0), x.get('week', 0)), reverse=True)
-    with open(PREDICTIONS_FILE, 'w') as f:
-        json.dump(existing_predictions, f, indent=2)
+    dump_json(existing_predictions, PREDICTIONS_FILE)
     
     print(f"\nGenerated {len(predictions)} predictions for week {current_week}")
     return predictions
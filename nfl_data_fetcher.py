@@ -3,13 +3,42 @@ NFL Data Fetcher
 Fetches NFL data from ESPN API including games, rosters, injuries, and stats
 """
 
-import requests
+import threading
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from http_cache import make_cached_session
 import time
 import json
 
+# Scoreboard dates fetched concurrently; each request is dominated by network round-trip time
+MAX_CONCURRENT_REQUESTS = 8
+
+# Seconds an ESPN response stays fresh: scoreboards change during game days, the team
+# catalog almost never; everything else (rosters, injuries, stats) is kept for an hour.
+# Patterns match as URL prefixes and the first match wins, so per-team URLs come first
+DEFAULT_EXPIRE_SECONDS = 60 * 60
+ESPN_EXPIRE_AFTER = {
+    '*/football/nfl/scoreboard': 300,
+    '*/football/nfl/teams/': DEFAULT_EXPIRE_SECONDS,
+    '*/football/nfl/teams': 24 * 60 * 60,
+}
+
+# Teams whose home stadium is indoor (dome or fixed/retractable roof); every other venue is outdoor
+INDOOR_TEAMS = frozenset({'ARI', 'ATL', 'DAL', 'DET', 'HOU', 'IND', 'LV', 'LAC', 'LAR', 'MIN', 'NO'})
+
+def _make_session():
+    """Cached ESPN session with the per-endpoint freshness above (see http_cache.make_cached_session)"""
+    session = make_cached_session(expire_after=DEFAULT_EXPIRE_SECONDS, urls_expire_after=ESPN_EXPIRE_AFTER)
+    session.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return session
+
 class NFLDataFetcher:
+    # Shared by every fetcher so repeat calls reuse pooled connections; opened on first use,
+    # under the lock since worker threads may get there at the same time (see clear_session)
+    _session = None
+    _session_lock = threading.Lock()
+    
     def __init__(self):
         self.base_url = "https://site.api.espn.com/apis/site/v2/sports/football/nfl"
         self.team_abbr_map = {
@@ -21,6 +50,35 @@ class NFLDataFetcher:
             'PHI': 'PHI', 'PIT': 'PIT', 'SF': 'SF', 'SEA': 'SEA', 'TB': 'TB',
             'TEN': 'TEN', 'WAS': 'WAS'
         }
+        self._team_id_map = None
+    
+    @property
+    def session(self):
+        """The shared ESPN session, opened (with its on-disk cache) on first use"""
+        with NFLDataFetcher._session_lock:
+            if NFLDataFetcher._session is None:
+                NFLDataFetcher._session = _make_session()
+            return NFLDataFetcher._session
+    
+    @classmethod
+    def clear_session(cls):
+        """Drop pooled connections and start a fresh session, e.g. after being rate limited"""
+        with NFLDataFetcher._session_lock:
+            if NFLDataFetcher._session is not None:
+                NFLDataFetcher._session.close()
+                NFLDataFetcher._session = None  # reopened on next use
+    
+    def _get_team_ids(self):
+        """ESPN team ids keyed by abbreviation, fetched from /teams once per fetcher"""
+        if self._team_id_map is None:
+            response = self.session.get(f"{self.base_url}/teams", timeout=10)
+            if response.status_code != 200:
+                return {}  # not cached, so a later call retries
+            team_ids = {}
+            for team in response.json().get('sports', [{}])[0].get('leagues', [{}])[0].get('teams', []):
+                team_ids.setdefault(team.get('team', {}).get('abbreviation'), team.get('team', {}).get('id'))
+            self._team_id_map = team_ids
+        return self._team_id_map
     
     def get_week_games(self, week=None, season=2025):
         """Get all games for a specific week"""
@@ -29,7 +87,7 @@ class NFLDataFetcher:
             try:
                 # Try current scoreboard
                 url = f"{self.base_url}/scoreboard"
-                response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+                response = self.session.get(url, timeout=10)
                 if response.status_code == 200:
                     data = response.json()
                     week = data.get('week', {}).get('number', 1)
@@ -52,7 +110,7 @@ class NFLDataFetcher:
         try:
             # Try regular season first
             url = f"{self.base_url}/scoreboard?seasontype=2&week={week}"
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 games = []
@@ -89,22 +147,14 @@ class NFLDataFetcher:
         """Get team statistics for the season"""
         try:
             # Get team ID first
-            url = f"{self.base_url}/teams"
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            if response.status_code == 200:
-                data = response.json()
-                team_id = None
-                for team in data.get('sports', [{}])[0].get('leagues', [{}])[0].get('teams', []):
-                    if team.get('team', {}).get('abbreviation') == team_abbr:
-                        team_id = team.get('team', {}).get('id')
-                        break
-                
-                if team_id:
-                    # Get team stats
-                    stats_url = f"{self.base_url}/teams/{team_id}/stats"
-                    stats_response = requests.get(stats_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-                    if stats_response.status_code == 200:
-                        return stats_response.json()
+            team_id = self._get_team_ids().get(team_abbr)
+            
+            if team_id:
+                # Get team stats
+                stats_url = f"{self.base_url}/teams/{team_id}/stats"
+                stats_response = self.session.get(stats_url, timeout=10)
+                if stats_response.status_code == 200:
+                    return stats_response.json()
         except Exception as e:
             print(f"Error fetching stats for {team_abbr}: {e}")
         
@@ -113,22 +163,14 @@ class NFLDataFetcher:
     def get_team_roster(self, team_abbr):
         """Get current roster for a team"""
         try:
-            url = f"{self.base_url}/teams"
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            if response.status_code == 200:
-                data = response.json()
-                team_id = None
-                for team in data.get('sports', [{}])[0].get('leagues', [{}])[0].get('teams', []):
-                    if team.get('team', {}).get('abbreviation') == team_abbr:
-                        team_id = team.get('team', {}).get('id')
-                        break
-                
-                if team_id:
-                    roster_url = f"{self.base_url}/teams/{team_id}/roster"
-                    roster_response = requests.get(roster_url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-                    if roster_response.status_code == 200:
-                        roster_data = roster_response.json()
-                        return roster_data.get('athletes', [])
+            team_id = self._get_team_ids().get(team_abbr)
+            
+            if team_id:
+                roster_url = f"{self.base_url}/teams/{team_id}/roster"
+                roster_response = self.session.get(roster_url, timeout=10)
+                if roster_response.status_code == 200:
+                    roster_data = roster_response.json()
+                    return roster_data.get('athletes', [])
         except Exception as e:
             print(f"Error fetching roster for {team_abbr}: {e}")
         
@@ -138,7 +180,7 @@ class NFLDataFetcher:
         """Get injury reports"""
         try:
             url = f"{self.base_url}/injuries"
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 injuries = {}
@@ -159,24 +201,41 @@ class NFLDataFetcher:
         
         return {}
     
+    def _fetch_scoreboard(self, date_formatted):
+        """(scoreboard JSON or None if not 200, error or None) for one YYYYMMDD date"""
+        try:
+            response = self.session.get(f"{self.base_url}/scoreboard?dates={date_formatted}", timeout=10)
+            return (response.json() if response.status_code == 200 else None), None
+        except Exception as e:
+            return None, e
+    
     def get_game_results(self, week=None, season=2025):
         """Get completed game results for a week"""
         games = self.get_week_games(week, season)
         results = []
         
+        # Scoreboard date for each game; a week's games share a few dates, so each distinct
+        # date is fetched once, several in flight at once
+        game_dates = []
         for game in games:
+            date_str = game.get('date', '')
+            game_dates.append(date_str.replace('-', '').replace('T', '').split('+')[0][:8] if date_str else None)
+        
+        dates = list(dict.fromkeys(date for date in game_dates if date))
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+            scoreboards = dict(zip(dates, executor.map(self._fetch_scoreboard, dates)))
+        
+        for game, date_formatted in zip(games, game_dates):
             try:
                 # Get detailed game info
-                date_str = game.get('date', '')
-                if not date_str:
+                if not date_formatted:
                     continue
                 
-                date_formatted = date_str.replace('-', '').replace('T', '').split('+')[0][:8]
-                url = f"{self.base_url}/scoreboard?dates={date_formatted}"
-                response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+                data, error = scoreboards[date_formatted]
+                if error is not None:
+                    raise error
                 
-                if response.status_code == 200:
-                    data = response.json()
+                if data is not None:
                     for event in data.get('events', []):
                         competitions = event.get('competitions', [])
                         if competitions:
@@ -224,15 +283,4 @@ class NFLDataFetcher:
     
     def get_venue_info(self, team_abbr):
         """Get venue information (indoor/outdoor)"""
-        venue_map = {
-            'ARI': 'indoor', 'ATL': 'indoor', 'BAL': 'outdoor', 'BUF': 'outdoor',
-            'CAR': 'outdoor', 'CHI': 'outdoor', 'CIN': 'outdoor', 'CLE': 'outdoor',
-            'DAL': 'indoor', 'DEN': 'outdoor', 'DET': 'indoor', 'GB': 'outdoor',
-            'HOU': 'indoor', 'IND': 'indoor', 'JAX': 'outdoor', 'KC': 'outdoor',
-            'LV': 'indoor', 'LAC': 'indoor', 'LAR': 'indoor', 'MIA': 'outdoor',
-            'MIN': 'indoor', 'NE': 'outdoor', 'NO': 'indoor', 'NYG': 'outdoor',
-            'NYJ': 'outdoor', 'PHI': 'outdoor', 'PIT': 'outdoor', 'SF': 'outdoor',
-            'SEA': 'outdoor', 'TB': 'outdoor', 'TEN': 'outdoor', 'WAS': 'outdoor'
-        }
-        return venue_map.get(team_abbr, 'outdoor')
-
+        return 'indoor' if team_abbr in INDOOR_TEAMS else 'outdoor'
@@ -3,6 +3,7 @@ NFL Game Predictor using Linear Regression
 Comprehensive model using past games, rosters, injuries, venue, matchups, and form
 """
 
+import functools
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
@@ -11,135 +12,140 @@ from sklearn.metrics import mean_squared_error, r2_score
 import pickle
 import os
 from datetime import datetime, timedelta
-from nfl_data_fetcher import NFLDataFetcher
+from nfl_data_fetcher import NFLDataFetcher, INDOOR_TEAMS
+
+# Length of the vector built by NFLGamePredictor.create_game_features
+N_FEATURES = 15
+
+@functools.lru_cache(maxsize=1)
+def _season_games():
+    """Synthetic 2024-25 season (seeded, so identical on every call); built once per process"""
+    data_fetcher = NFLDataFetcher()
+    # For now, generate synthetic data based on realistic NFL stats
+    # In production, you'd load from a database or API
+    
+    # Generate sample data for 2024-25 season
+    teams = ['BUF', 'MIA', 'NE', 'NYJ', 'BAL', 'CIN', 'CLE', 'PIT',
+             'HOU', 'IND', 'JAX', 'TEN', 'DEN', 'KC', 'LV', 'LAC',
+             'DAL', 'NYG', 'PHI', 'WAS', 'CHI', 'DET', 'GB', 'MIN',
+             'ATL', 'CAR', 'NO', 'TB', 'ARI', 'LAR', 'SF', 'SEA']
+    
+    # Games for multiple weeks: every week pairs teams[0] v teams[1], teams[2] v teams[3], ...
+    num_weeks = 18  # Regular season weeks
+    home_teams = np.array(teams[0::2] * num_weeks, dtype=object)
+    away_teams = np.array(teams[1::2] * num_weeks, dtype=object)
+    weeks = np.repeat(np.arange(1, num_weeks + 1), len(teams) // 2)
+    num_games = len(weeks)
+    
+    # Random draws game by game in the seeded order (home/away offense, home/away defense,
+    # then home/away score noise) so the season is the same as when each was drawn singly
+    np.random.seed(42)
+    uniforms = np.empty((num_games, 4))
+    noise = np.empty((num_games, 2))
+    for i in range(num_games):
+        uniforms[i] = np.random.random_sample(4)
+        noise[i] = np.random.standard_normal(2)
+    
+    # Scaled exactly as np.random.uniform(low, high) does: low + (high - low) * u
+    low = np.array([0.4, 0.4, 0.3, 0.3])
+    high = np.array([0.7, 0.7, 0.6, 0.6])
+    home_off_rating, away_off_rating, home_def_rating, away_def_rating = (low + (high - low) * uniforms).T
+    
+    # Home field advantage
+    home_advantage = 0.03
+    
+    # Venue factor
+    venues = np.array([data_fetcher.get_venue_info(team) for team in home_teams], dtype=object)
+    venue_factor = np.where(venues == 'indoor', 0.02, 0.0)
+    
+    # Calculate expected scores
+    home_expected = (home_off_rating * 30 + away_def_rating * 20) * (1 + home_advantage + venue_factor)
+    away_expected = (away_off_rating * 30 + home_def_rating * 20)
+    
+    # Add noise (normal with standard deviation 7, truncated to whole non-negative points)
+    home_scores = np.maximum(0, np.trunc(home_expected + 7 * noise[:, 0]).astype(np.int64))
+    away_scores = np.maximum(0, np.trunc(away_expected + 7 * noise[:, 1]).astype(np.int64))
+    
+    # Determine winner
+    winners = np.where(home_scores > away_scores, home_teams, away_teams)
+    
+    df = pd.DataFrame({
+        'home_team': home_teams.tolist(),
+        'away_team': away_teams.tolist(),
+        'home_score': home_scores,
+        'away_score': away_scores,
+        'winner': winners.tolist(),
+        'home_off_rating': home_off_rating,
+        'away_off_rating': away_off_rating,
+        'home_def_rating': home_def_rating,
+        'away_def_rating': away_def_rating,
+        'venue': venues.tolist(),
+        'week': weeks
+    })
+    return df
 
 class NFLGamePredictor:
     def __init__(self):
         self.model = LinearRegression()
         self.data_fetcher = NFLDataFetcher()
         self.model_file = 'nfl_model.pkl'
+        self._team_features = None
+        self._team_features_source = None
+        self._coef = None
+        self._intercept = None
     
     def load_data(self):
         """Load or generate NFL game data"""
-        # For now, generate synthetic data based on realistic NFL stats
-        # In production, you'd load from a database or API
-        
-        # Generate sample data for 2024-25 season
-        teams = ['BUF', 'MIA', 'NE', 'NYJ', 'BAL', 'CIN', 'CLE', 'PIT',
-                 'HOU', 'IND', 'JAX', 'TEN', 'DEN', 'KC', 'LV', 'LAC',
-                 'DAL', 'NYG', 'PHI', 'WAS', 'CHI', 'DET', 'GB', 'MIN',
-                 'ATL', 'CAR', 'NO', 'TB', 'ARI', 'LAR', 'SF', 'SEA']
-        
-        games = []
-        np.random.seed(42)
-        
-        # Generate games for multiple weeks
-        for week in range(1, 19):  # Regular season weeks
-            for i in range(len(teams) // 2):
-                home_idx = i * 2
-                away_idx = i * 2 + 1
-                
-                home_team = teams[home_idx]
-                away_team = teams[away_idx]
-                
-                # Generate realistic features
-                home_off_rating = np.random.uniform(0.4, 0.7)
-                away_off_rating = np.random.uniform(0.4, 0.7)
-                home_def_rating = np.random.uniform(0.3, 0.6)
-                away_def_rating = np.random.uniform(0.3, 0.6)
-                
-                # Home field advantage
-                home_advantage = 0.03
-                
-                # Venue factor
-                venue = self.data_fetcher.get_venue_info(home_team)
-                venue_factor = 0.02 if venue == 'indoor' else 0.0
-                
-                # Calculate expected scores
-                home_expected = (home_off_rating * 30 + away_def_rating * 20) * (1 + home_advantage + venue_factor)
-                away_expected = (away_off_rating * 30 + home_def_rating * 20)
-                
-                # Add noise
-                home_score = max(0, int(np.random.normal(home_expected, 7)))
-                away_score = max(0, int(np.random.normal(away_expected, 7)))
-                
-                # Determine winner
-                winner = home_team if home_score > away_score else away_team
-                
-                games.append({
-                    'home_team': home_team,
-                    'away_team': away_team,
-                    'home_score': home_score,
-                    'away_score': away_score,
-                    'winner': winner,
-                    'home_off_rating': home_off_rating,
-                    'away_off_rating': away_off_rating,
-                    'home_def_rating': home_def_rating,
-                    'away_def_rating': away_def_rating,
-                    'venue': venue,
-                    'week': week
-                })
-        
-        df = pd.DataFrame(games)
-        return df
+        # Copy so callers can't modify the cached frame
+        return _season_games().copy()
     
-    def calculate_team_features(self, team_abbr, df, date=None):
-        """Calculate comprehensive team features"""
-        team_games = df[(df['home_team'] == team_abbr) | (df['away_team'] == team_abbr)].copy()
-        
-        if len(team_games) == 0:
-            return None
+    def calculate_all_team_features(self, df):
+        """Calculate comprehensive features for every team in one pass over df"""
+        # One row per (team, game), in df order: each game's home side, then its away side
+        home_won = (df['winner'] == df['home_team']).to_numpy()
+        away_won = (df['winner'] == df['away_team']).to_numpy()
+        team_games = pd.DataFrame({
+            'team': np.column_stack([df['home_team'].to_numpy(), df['away_team'].to_numpy()]).ravel(),
+            'points_for': np.column_stack([df['home_score'].to_numpy(), df['away_score'].to_numpy()]).ravel(),
+            'points_against': np.column_stack([df['away_score'].to_numpy(), df['home_score'].to_numpy()]).ravel(),
+            'won': np.column_stack([home_won, away_won]).ravel()
+        })
         
         # Recent form (last 5 games)
-        recent_games = team_games.tail(5)
-        
-        # Calculate metrics
-        wins = 0
-        total_points_for = 0
-        total_points_against = 0
-        games_count = 0
-        
-        for _, game in recent_games.iterrows():
-            if game['home_team'] == team_abbr:
-                total_points_for += game['home_score']
-                total_points_against += game['away_score']
-                if game['winner'] == team_abbr:
-                    wins += 1
-            else:
-                total_points_for += game['away_score']
-                total_points_against += game['home_score']
-                if game['winner'] == team_abbr:
-                    wins += 1
-            games_count += 1
-        
-        if games_count == 0:
-            return None
-        
-        # Features
-        win_rate = wins / games_count
-        avg_points_for = total_points_for / games_count
-        avg_points_against = total_points_against / games_count
-        point_differential = avg_points_for - avg_points_against
+        recent = team_games.groupby('team', sort=False).tail(5).groupby('team', sort=False).agg(
+            win_rate=('won', 'mean'),
+            avg_points_for=('points_for', 'mean'),
+            avg_points_against=('points_against', 'mean')
+        )
         
         # Overall season stats
-        all_team_games = team_games
-        season_wins = sum(1 for _, g in all_team_games.iterrows() 
-                         if (g['home_team'] == team_abbr and g['winner'] == team_abbr) or
-                            (g['away_team'] == team_abbr and g['winner'] == team_abbr))
-        season_games = len(all_team_games)
-        season_win_rate = season_wins / season_games if season_games > 0 else 0.5
+        season_win_rate = team_games.groupby('team', sort=False)['won'].mean()
         
-        return {
-            'win_rate': win_rate,
-            'avg_points_for': avg_points_for,
-            'avg_points_against': avg_points_against,
-            'point_differential': point_differential,
+        features = pd.DataFrame({
+            'win_rate': recent['win_rate'],
+            'avg_points_for': recent['avg_points_for'],
+            'avg_points_against': recent['avg_points_against'],
+            'point_differential': recent['avg_points_for'] - recent['avg_points_against'],
             'season_win_rate': season_win_rate,
-            'recent_form': win_rate  # Last 5 games win rate
-        }
+            'recent_form': recent['win_rate']  # Last 5 games win rate
+        })
+        
+        self._team_features = features.to_dict('index')
+        self._team_features_source = df
+        return self._team_features
     
-    def create_game_features(self, home_team, away_team, df, injury_data=None):
-        """Create comprehensive features for a game prediction"""
+    def calculate_team_features(self, team_abbr, df, date=None):
+        """Calculate comprehensive team features (None if the team has no games in df)"""
+        if self._team_features_source is not df:
+            self.calculate_all_team_features(df)
+        return self._team_features.get(team_abbr)
+    
+    def create_game_features(self, home_team, away_team, df, injury_data=None, out=None):
+        """Create comprehensive features for a game prediction
+        
+        If out (a length-N_FEATURES array, e.g. a row of a preallocated matrix) is
+        given the features are written into it and it is returned.
+        """
         home_features = self.calculate_team_features(home_team, df)
         away_features = self.calculate_team_features(away_team, df)
         
@@ -147,8 +153,7 @@ class NFLGamePredictor:
             return None
         
         # Get venue info
-        venue = self.data_fetcher.get_venue_info(home_team)
-        venue_indoor = 1 if venue == 'indoor' else 0
+        venue_indoor = 1 if home_team in INDOOR_TEAMS else 0
         
         # Injury factors
         home_injury_factor = 1.0
@@ -186,33 +191,40 @@ class NFLGamePredictor:
             # Head-to-head would go here if available
         ]
         
-        return np.array(features)
+        if out is None:
+            return np.array(features)
+        out[:] = features
+        return out
     
     def train(self, df):
         """Train the linear regression model"""
         print("Preparing training data...")
         
-        X = []
-        y = []
+        X = np.empty((len(df), N_FEATURES))
+        has_features = np.zeros(len(df), dtype=bool)
+        
+        # Walk the needed columns as arrays rather than building a Series per row
+        home_teams = df['home_team'].to_numpy()
+        away_teams = df['away_team'].to_numpy()
         
-        for _, game in df.iterrows():
+        for i in range(len(df)):
             features = self.create_game_features(
-                game['home_team'],
-                game['away_team'],
-                df
+                home_teams[i],
+                away_teams[i],
+                df,
+                out=X[i]
             )
             
             if features is not None:
-                X.append(features)
-                # Target: point differential (home - away)
-                y.append(game['home_score'] - game['away_score'])
+                has_features[i] = True
         
-        if len(X) == 0:
+        if not has_features.any():
             print("No valid training data!")
             return
         
-        X = np.array(X)
-        y = np.array(y)
+        X = X[has_features]
+        # Target: point differential (home - away) of every game that has features
+        y = (df['home_score'] - df['away_score']).to_numpy()[has_features]
         
         print(f"Training on {len(X)} games...")
         
@@ -221,6 +233,7 @@ class NFLGamePredictor:
         
         # Train model
         self.model.fit(X_train, y_train)
+        self._cache_coefficients()
         
         # Evaluate
         y_pred = self.model.predict(X_test)
@@ -233,36 +246,63 @@ class NFLGamePredictor:
     
     def predict(self, home_team, away_team, df, injury_data=None):
         """Predict game outcome"""
-        features = self.create_game_features(home_team, away_team, df, injury_data)
-        
-        if features is None:
-            return None
+        return self.predict_games([(home_team, away_team)], df, [injury_data])[0]
+    
+    def predict_games(self, pairs, df, injury_data=None):
+        """Predict many (home_team, away_team) games with one model.predict call
         
-        # Predict point differential
-        point_diff = self.model.predict(features.reshape(1, -1))[0]
+        injury_data, if given, is a list aligned with pairs of the per-game dicts
+        accepted by predict. Games where either team has no data come back as None.
+        """
+        injury_data = injury_data or [None] * len(pairs)
+        features = [self.create_game_features(home_team, away_team, df, injuries)
+                    for (home_team, away_team), injuries in zip(pairs, injury_data)]
+        known = [i for i, game_features in enumerate(features) if game_features is not None]
         
-        # Determine winner
-        if point_diff > 0:
-            winner = home_team
-            confidence = min(0.95, 0.5 + abs(point_diff) / 30)
-        else:
-            winner = away_team
-            confidence = min(0.95, 0.5 + abs(point_diff) / 30)
+        results = [None] * len(pairs)
+        if not known:
+            return results
         
-        # Estimate scores
-        avg_total = 45  # Average total points in NFL
-        home_score = int(avg_total / 2 + point_diff / 2)
-        away_score = int(avg_total / 2 - point_diff / 2)
+        # Predict point differential
+        point_diffs = self._predict_point_diffs(np.vstack([features[i] for i in known]))
         
-        return {
-            'winner': winner,
-            'confidence': confidence,
-            'home_win_prob': 0.5 + point_diff / 60 if point_diff > 0 else 0.5 - abs(point_diff) / 60,
-            'away_win_prob': 0.5 - point_diff / 60 if point_diff > 0 else 0.5 + abs(point_diff) / 60,
-            'predicted_home_score': max(0, home_score),
-            'predicted_away_score': max(0, away_score),
-            'point_differential': point_diff
-        }
+        for i, point_diff in zip(known, point_diffs):
+            home_team, away_team = pairs[i]
+            
+            # Determine winner
+            if point_diff > 0:
+                winner = home_team
+                confidence = min(0.95, 0.5 + abs(point_diff) / 30)
+            else:
+                winner = away_team
+                confidence = min(0.95, 0.5 + abs(point_diff) / 30)
+            
+            # Estimate scores
+            avg_total = 45  # Average total points in NFL
+            home_score = int(avg_total / 2 + point_diff / 2)
+            away_score = int(avg_total / 2 - point_diff / 2)
+            
+            results[i] = {
+                'winner': winner,
+                'confidence': confidence,
+                'home_win_prob': 0.5 + point_diff / 60 if point_diff > 0 else 0.5 - abs(point_diff) / 60,
+                'away_win_prob': 0.5 - point_diff / 60 if point_diff > 0 else 0.5 + abs(point_diff) / 60,
+                'predicted_home_score': max(0, home_score),
+                'predicted_away_score': max(0, away_score),
+                'point_differential': point_diff
+            }
+        return results
+    
+    def _cache_coefficients(self):
+        """Keep the fitted weights so predictions skip LinearRegression.predict's input validation"""
+        self._coef = self.model.coef_
+        self._intercept = self.model.intercept_
+    
+    def _predict_point_diffs(self, X):
+        """Predicted point differential for each row of X (the same X @ coef_ + intercept_ as model.predict)"""
+        if self._coef is None:
+            return self.model.predict(X)  # not fitted yet: let scikit-learn raise
+        return X @ self._coef + self._intercept
     
     def save_model(self, filename=None):
         """Save trained model"""
@@ -279,6 +319,7 @@ class NFLGamePredictor:
         if os.path.exists(filename):
             with open(filename, 'rb') as f:
                 self.model = pickle.load(f)
+            self._cache_coefficients()
             print(f"Model loaded from {filename}")
         else:
             raise FileNotFoundError(f"Model file {filename} not found")